@@ -6,33 +6,68 @@ ZGGG优化积压时段识别分析
 积压时段应该是短时的、波动性的现象，而非长时间持续状态
 """
 
+import os
 import pandas as pd
 import numpy as np
+import matplotlib
+# 无显示环境(批处理/服务器)时使用Agg后端，只输出PNG
+if os.environ.get('DISPLAY') is None:
+    matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import seaborn as sns
+from dataclasses import dataclass
 from datetime import datetime, timedelta
+from pathlib import Path
 import warnings
 warnings.filterwarnings('ignore')
 
 # 导入仿真器
 from ZGGG起飞仿真系统 import ZGGGDepartureSimulator
+from _fast import find_runs, hour_date_counts
 
 # 设置中文字体
 plt.rcParams['font.sans-serif'] = ['SimHei', 'Arial Unicode MS']
 plt.rcParams['axes.unicode_minus'] = False
 
+# 原始数据路径及解析结果的Parquet缓存(与xlsx同目录)
+DATA_PATH = Path('/Users/megrez/Library/Mobile Documents/com~apple~CloudDocs/BUAA/科研/挑战杯/航空挑战杯/数据/5月航班运行数据（脱敏）.xlsx')
+CACHE_PATH = DATA_PATH.with_name('5月航班运行数据.parquet')
+
+# 安装python-calamine时用其解析xlsx(远快于openpyxl)，否则退回openpyxl
+try:
+    import python_calamine  # noqa: F401
+    EXCEL_ENGINE = 'calamine'
+except ImportError:
+    EXCEL_ENGINE = 'openpyxl'
+
+@dataclass
+class HourlyStats:
+    """每小时延误统计，各字段为长度24的数组，按小时下标访问"""
+    daily_mean: np.ndarray
+    daily_std: np.ndarray
+    daily_max: np.ndarray
+    daily_min: np.ndarray
+    total_days: np.ndarray
+    zero_days: np.ndarray
+
 class OptimizedBacklogAnalyzer:
-    def __init__(self, delay_threshold=4, base_backlog_threshold=10):
+    def __init__(self, delay_threshold=4, base_backlog_threshold=10, verbose=True, backend='numpy'):
         """
         优化的积压分析器
         
         Args:
             delay_threshold: 延误判定阈值(分钟)
             base_backlog_threshold: 基础积压判定阈值(班次/小时)
+            verbose: 是否输出逐小时诊断表(批处理时可关闭)
+            backend: 分组计数后端，'numpy'(NumPy/Numba内核)、'pandas'或'polars'(需安装polars)
         """
         self.delay_threshold = delay_threshold
         self.base_backlog_threshold = base_backlog_threshold
+        self.verbose = verbose
+        self.backend = backend
         self.real_data = None
+        self._total_counts = None
+        self._delayed_counts = None
         
         print(f"=== 优化积压分析器初始化 ===")
         print(f"延误判定阈值: {delay_threshold} 分钟")
@@ -42,66 +77,114 @@ class OptimizedBacklogAnalyzer:
         """载入真实数据"""
         print(f"\n=== 载入真实数据 ===")
         
-        df = pd.read_excel('/Users/megrez/Library/Mobile Documents/com~apple~CloudDocs/BUAA/科研/挑战杯/航空挑战杯/数据/5月航班运行数据（脱敏）.xlsx')
-        
-        # 提取ZGGG起飞航班
-        zggg_dep = df[df['实际起飞站四字码'] == 'ZGGG'].copy()
-        
-        # 转换时间字段
         time_fields = ['计划离港时间', '实际离港时间', '实际起飞时间']
-        for field in time_fields:
-            zggg_dep[field] = pd.to_datetime(zggg_dep[field], errors='coerce')
+        
+        # 优先读取Parquet缓存，xlsx更新后缓存失效重新解析
+        if CACHE_PATH.exists() and CACHE_PATH.stat().st_mtime >= DATA_PATH.stat().st_mtime:
+            df = pd.read_parquet(CACHE_PATH)
+        else:
+            # 只保留用到的列，时间列解析后再写入缓存(混合类型列无法写入Parquet)
+            df = pd.read_excel(DATA_PATH, usecols=['实际起飞站四字码'] + time_fields, engine=EXCEL_ENGINE)
+            df = df.assign(**{
+                field: lambda d, field=field: pd.to_datetime(d[field], errors='coerce')
+                for field in time_fields
+            })
+            df.to_parquet(CACHE_PATH, compression='zstd')
+        
+        # 提取ZGGG起飞航班(四字码转为分类类型后再做比较)
+        station = df['实际起飞站四字码'].astype('category')
+        zggg_dep = df.loc[(station == 'ZGGG').to_numpy()].reset_index(drop=True)
         
         # 只保留有完整时间数据的航班
-        self.real_data = zggg_dep.dropna(subset=time_fields).copy()
+        self.real_data = zggg_dep.dropna(subset=time_fields)
+        
+        # 计算延误时间 - int64纳秒相减后整除得到整数分钟
+        takeoff_ns = self.real_data['实际起飞时间'].to_numpy(dtype='datetime64[ns]').view('i8')
+        plan_ns = self.real_data['计划离港时间'].to_numpy(dtype='datetime64[ns]').view('i8')
+        self.real_data['起飞延误分钟'] = ((takeoff_ns - plan_ns) // 60_000_000_000).astype('int32')
         
-        # 计算延误时间
-        self.real_data['起飞延误分钟'] = (
-            self.real_data['实际起飞时间'] - self.real_data['计划离港时间']
-        ).dt.total_seconds() / 60
+        self._prepare_hourly_counts()
         
         print(f"真实数据载入: {len(self.real_data)} 班航班")
         return self.real_data
     
+    def _prepare_hourly_counts(self):
+        """一次分组同时得到各(小时, 日期)的总航班数和延误航班数(24行×日期列)"""
+        # 小时用int8、日期用datetime64[D]，分组键不再是Python日期对象
+        plan = self.real_data['计划离港时间'].to_numpy(dtype='datetime64[ns]')
+        self.real_data['hour'] = self.real_data['计划离港时间'].dt.hour.astype('int8')
+        self.real_data['date'] = plan.astype('datetime64[D]')
+        self.real_data['is_delayed'] = self.real_data['起飞延误分钟'] > self.delay_threshold
+        
+        if self.backend == 'numpy':
+            self._total_counts, self._delayed_counts = self._hourly_counts_numpy()
+            return
+        
+        if self.backend == 'polars':
+            total, delayed = self._hourly_counts_polars()
+        else:
+            grouped = self.real_data.groupby(['hour', 'date'])
+            total, delayed = grouped.size(), grouped['is_delayed'].sum().astype(int)
+        
+        # 日期列补齐为数据覆盖的完整日期范围，无航班的日期计为0
+        all_dates = pd.date_range(self.real_data['date'].min(), self.real_data['date'].max(), freq='D')
+        self._total_counts = self._to_hour_matrix(total, all_dates)
+        self._delayed_counts = self._to_hour_matrix(delayed, all_dates)
+    
+    def _hourly_counts_numpy(self):
+        """单次遍历编码后的小时/日序号数组得到两个计数矩阵(安装numba时JIT编译)"""
+        day = self.real_data['date'].to_numpy(dtype='datetime64[D]').astype(np.int64)
+        first_day = day.min()
+        n_days = int(day.max() - first_day) + 1
+        total, delayed = hour_date_counts(
+            self.real_data['hour'].to_numpy(), day - first_day,
+            self.real_data['is_delayed'].to_numpy(), n_days
+        )
+        
+        dates = pd.date_range(pd.Timestamp(np.datetime64(first_day, 'D')), periods=n_days, freq='D')
+        return (pd.DataFrame(total, index=range(24), columns=dates),
+                pd.DataFrame(delayed, index=range(24), columns=dates))
+    
+    def _hourly_counts_polars(self):
+        """用Polars惰性多线程执行(小时, 日期)分组计数，结果转回pandas"""
+        import polars as pl
+        
+        counts = (
+            pl.from_pandas(self.real_data[['hour', 'date', 'is_delayed']])
+            .lazy()
+            .group_by(['hour', 'date'])
+            .agg([
+                pl.len().alias('total'),
+                pl.col('is_delayed').sum().alias('delayed')
+            ])
+            .collect()
+            .to_pandas()
+            .set_index(['hour', 'date'])
+        )
+        return counts['total'], counts['delayed'].astype(int)
+    
     def analyze_hourly_patterns(self):
         """分析每小时的延误模式"""
         print(f"\n=== 分析每小时延误模式 ===")
         
         # 识别延误航班
-        delayed_flights = self.real_data[
-            self.real_data['起飞延误分钟'] > self.delay_threshold
-        ].copy()
+        delayed_flights = self.real_data[self.real_data['is_delayed']]
         
         print(f"延误航班总数: {len(delayed_flights)} 班 ({len(delayed_flights)/len(self.real_data)*100:.1f}%)")
         
-        # 按小时统计
-        delayed_flights['hour'] = delayed_flights['计划离港时间'].dt.hour
-        delayed_flights['date'] = delayed_flights['计划离港时间'].dt.date
-        
-        # 计算每小时的统计信息
-        hourly_stats = {}
-        
-        for hour in range(24):
-            hour_data = delayed_flights[delayed_flights['hour'] == hour]
-            if len(hour_data) > 0:
-                daily_counts = hour_data.groupby('date').size()
-                hourly_stats[hour] = {
-                    'daily_mean': daily_counts.mean(),
-                    'daily_std': daily_counts.std(),
-                    'daily_max': daily_counts.max(),
-                    'daily_min': daily_counts.min(),
-                    'total_days': len(daily_counts),
-                    'zero_days': 31 - len(daily_counts)  # 5月31天减去有延误的天数
-                }
-            else:
-                hourly_stats[hour] = {
-                    'daily_mean': 0,
-                    'daily_std': 0,
-                    'daily_max': 0,
-                    'daily_min': 0,
-                    'total_days': 0,
-                    'zero_days': 31
-                }
+        # 计算每小时的统计信息 - 直接使用载入时得到的(小时 × 日期)延误计数矩阵
+        # 计数为0的格子置为NaN，使均值/标准差只统计有延误的天数
+        counts = self._delayed_counts
+        present = counts.where(counts > 0)
+        total_days = present.count(axis=1).to_numpy()
+        hourly_stats = HourlyStats(
+            daily_mean=present.mean(axis=1).fillna(0).to_numpy(),
+            daily_std=present.std(axis=1).where(counts.sum(axis=1) > 0, 0).to_numpy(),
+            daily_max=present.max(axis=1).fillna(0).astype(int).to_numpy(),
+            daily_min=present.min(axis=1).fillna(0).astype(int).to_numpy(),
+            total_days=total_days,
+            zero_days=(counts == 0).sum(axis=1).to_numpy()  # 数据覆盖天数中无延误的天数
+        )
         
         return hourly_stats, delayed_flights
     
@@ -110,115 +193,97 @@ class OptimizedBacklogAnalyzer:
         print(f"\n=== 动态识别积压时段 ===")
         
         # 计算动态阈值
-        all_means = [stats['daily_mean'] for stats in hourly_stats.values()]
-        overall_mean = np.mean(all_means)
-        overall_std = np.std(all_means)
+        means = hourly_stats.daily_mean
+        stds = hourly_stats.daily_std
+        maxs = hourly_stats.daily_max
+        overall_mean = means.mean()
+        overall_std = means.std()
         
         print(f"全天延误航班均值: {overall_mean:.1f} 班/小时")
         print(f"全天延误航班标准差: {overall_std:.1f}")
         
+        if self.verbose:
+            report = pd.DataFrame({'均值': means, '标准差': stds, '最大': maxs}, index=self._hour_labels())
+            print(f"\n各小时延误情况分析:")
+            print(report.to_string(float_format=lambda v: f'{v:.1f}'))
+        
         # 方法1: 基于统计异常的积压识别
         # 积压定义：显著高于平均水平且变异性较大的时段
         backlog_criteria = {
-            'statistical': [],  # 统计异常积压
-            'absolute': [],     # 绝对阈值积压
-            'relative': []      # 相对波动积压
+            # 统计异常积压：均值超过全体均值+1倍标准差
+            'statistical': np.flatnonzero(means > overall_mean + overall_std).tolist(),
+            # 绝对阈值积压：均值超过基础阈值
+            'absolute': np.flatnonzero(means > self.base_backlog_threshold).tolist(),
+            # 相对波动积压：标准差较大且均值较高的时段
+            'relative': np.flatnonzero((stds > 5) & (means > overall_mean)).tolist()
         }
         
-        print(f"\n各小时延误情况分析:")
-        for hour in range(24):
-            stats = hourly_stats[hour]
-            mean_val = stats['daily_mean']
-            std_val = stats['daily_std']
-            max_val = stats['daily_max']
-            
-            print(f"  {hour:02d}:00-{hour+1:02d}:00: 均值{mean_val:.1f}, 标准差{std_val:.1f}, 最大{max_val}")
-            
-            # 统计异常标准：均值超过全体均值+1倍标准差
-            if mean_val > (overall_mean + overall_std):
-                backlog_criteria['statistical'].append(hour)
-            
-            # 绝对阈值标准：均值超过基础阈值
-            if mean_val > self.base_backlog_threshold:
-                backlog_criteria['absolute'].append(hour)
-            
-            # 相对波动标准：标准差较大且均值较高的时段
-            if std_val > 5 and mean_val > overall_mean:
-                backlog_criteria['relative'].append(hour)
-        
         return backlog_criteria, overall_mean, overall_std
     
     def identify_surge_periods(self, hourly_stats):
         """识别流量激增时段"""
         print(f"\n=== 识别流量激增时段 ===")
         
-        surge_periods = []
-        
-        # 载入所有航班数据（不仅仅是延误航班）
-        all_flights = self.real_data.copy()
-        all_flights['hour'] = all_flights['计划离港时间'].dt.hour
-        all_flights['date'] = all_flights['计划离港时间'].dt.date
-        
-        # 计算每小时总航班量
-        hourly_total_stats = {}
-        for hour in range(24):
-            hour_data = all_flights[all_flights['hour'] == hour]
-            daily_counts = hour_data.groupby('date').size()
-            hourly_total_stats[hour] = {
-                'daily_mean': daily_counts.mean() if len(daily_counts) > 0 else 0,
-                'daily_std': daily_counts.std() if len(daily_counts) > 0 else 0
+        # 计算每小时总航班量(所有航班，不仅仅是延误航班)
+        present = self._total_counts.where(self._total_counts > 0)
+        hourly_total_mean = present.mean(axis=1).fillna(0)
+        hourly_total_std = present.std(axis=1).where(present.count(axis=1) > 0, 0)
+        hourly_total_stats = {
+            hour: {
+                'daily_mean': hourly_total_mean[hour],
+                'daily_std': hourly_total_std[hour]
             }
+            for hour in range(24)
+        }
         
         # 识别流量激增导致的积压
-        print(f"各小时总航班流量分析:")
-        for hour in range(24):
-            total_stats = hourly_total_stats[hour]
-            delay_stats = hourly_stats[hour]
-            
-            total_mean = total_stats['daily_mean']
-            delay_mean = delay_stats['daily_mean']
-            delay_rate = (delay_mean / total_mean * 100) if total_mean > 0 else 0
-            
-            print(f"  {hour:02d}:00-{hour+1:02d}:00: 总量{total_mean:.1f}, 延误{delay_mean:.1f}, 延误率{delay_rate:.1f}%")
-            
-            # 积压判定：总量高且延误率高的时段
-            if total_mean > 15 and delay_rate > 70:  # 航班量>15且延误率>70%
-                surge_periods.append({
-                    'hour': hour,
-                    'total_flights': total_mean,
-                    'delayed_flights': delay_mean,
-                    'delay_rate': delay_rate
-                })
+        total_means = hourly_total_mean.to_numpy()
+        delay_means = hourly_stats.daily_mean
+        delay_rates = np.divide(delay_means * 100, total_means,
+                                out=np.zeros(24), where=total_means > 0)
+        
+        if self.verbose:
+            report = pd.DataFrame({'总量': total_means, '延误': delay_means, '延误率%': delay_rates},
+                                  index=self._hour_labels())
+            print(f"各小时总航班流量分析:")
+            print(report.to_string(float_format=lambda v: f'{v:.1f}'))
+        
+        # 积压判定：总量高且延误率高的时段(航班量>15且延误率>70%)
+        surge_periods = [
+            {
+                'hour': hour,
+                'total_flights': total_means[hour],
+                'delayed_flights': delay_means[hour],
+                'delay_rate': delay_rates[hour]
+            }
+            for hour in np.flatnonzero((total_means > 15) & (delay_rates > 70)).tolist()
+        ]
         
         return surge_periods, hourly_total_stats
     
+    def _hour_labels(self):
+        """诊断表的小时行标签"""
+        return [f'{h:02d}:00-{h+1:02d}:00' for h in range(24)]
+    
+    def _to_hour_matrix(self, counts, all_dates):
+        """将(小时, 日期)计数展开为24行×完整日期列的矩阵，缺失格子为0"""
+        matrix = counts.unstack('date', fill_value=0)
+        matrix.columns = pd.DatetimeIndex(matrix.columns)
+        return matrix.reindex(index=range(24), columns=all_dates, fill_value=0)
+    
     def find_continuous_backlog_periods(self, backlog_hours):
         """查找连续积压时段，限制在合理范围内"""
         if not backlog_hours:
             return []
         
-        hours = sorted(backlog_hours)
+        # 按相邻小时差切分连续段，1-5小时为合理的积压持续时间
         continuous_periods = []
-        current_period = [hours[0]]
-        
-        for i in range(1, len(hours)):
-            if hours[i] - hours[i-1] == 1:  # 连续小时
-                current_period.append(hours[i])
+        for period in find_runs(backlog_hours):
+            if len(period) <= 5:
+                continuous_periods.append(period)
             else:
-                # 检查连续时段长度
-                if 1 <= len(current_period) <= 5:  # 合理的积压持续时间：1-5小时
-                    continuous_periods.append(current_period)
-                elif len(current_period) > 5:
-                    # 长时段可能是持续繁忙而非真正积压，分割处理
-                    print(f"  长时段{current_period[0]:02d}:00-{current_period[-1]+1:02d}:00 (持续{len(current_period)}小时) - 可能非真实积压")
-                
-                current_period = [hours[i]]
-        
-        # 处理最后一个时段
-        if 1 <= len(current_period) <= 5:
-            continuous_periods.append(current_period)
-        elif len(current_period) > 5:
-            print(f"  长时段{current_period[0]:02d}:00-{current_period[-1]+1:02d}:00 (持续{len(current_period)}小时) - 可能非真实积压")
+                # 长时段可能是持续繁忙而非真正积压
+                print(f"  长时段{period[0]:02d}:00-{period[-1]+1:02d}:00 (持续{len(period)}小时) - 可能非真实积压")
         
         return continuous_periods
     
@@ -244,60 +309,71 @@ class OptimizedBacklogAnalyzer:
         print(f"相对波动积压时段: {len(backlog_criteria['relative'])} 个: {backlog_criteria['relative']}")
         print(f"流量激增积压时段: {len(surge_periods)} 个: {[p['hour'] for p in surge_periods]}")
         
-        # 综合多种标准，取交集作为真正的积压时段
-        final_backlog_hours = set(backlog_criteria['statistical']) & set([p['hour'] for p in surge_periods])
+        # 综合多种标准，取交集作为真正的积压时段(24小时布尔掩码按位与)
+        statistical_mask = np.zeros(24, dtype=bool)
+        statistical_mask[backlog_criteria['statistical']] = True
+        surge_mask = np.zeros(24, dtype=bool)
+        surge_mask[[p['hour'] for p in surge_periods]] = True
+        final_mask = statistical_mask & surge_mask
         
-        if not final_backlog_hours:
+        if not final_mask.any():
             # 如果交集为空，使用统计异常标准但限制连续长度
-            final_backlog_hours = set(backlog_criteria['statistical'])
+            final_mask = statistical_mask
+        
+        final_backlog_hours = np.flatnonzero(final_mask).tolist()
         
-        print(f"\n最终积压时段: {len(final_backlog_hours)} 个: {sorted(final_backlog_hours)}")
+        print(f"\n最终积压时段: {len(final_backlog_hours)} 个: {final_backlog_hours}")
         
         # 5. 查找连续积压时段（限制合理长度）
-        continuous_periods = self.find_continuous_backlog_periods(list(final_backlog_hours))
+        continuous_periods = self.find_continuous_backlog_periods(final_backlog_hours)
         
         print(f"\n连续积压时段分析:")
         for i, period in enumerate(continuous_periods, 1):
             start, end = period[0], period[-1]
             duration = len(period)
-            total_delays = sum([hourly_stats[h]['daily_mean'] for h in period])
+            total_delays = hourly_stats.daily_mean[period].sum()
             print(f"  连续积压{i}: {start:02d}:00-{end+1:02d}:00 (持续{duration}小时, 日均{total_delays:.1f}班延误)")
         
         return {
             'hourly_stats': hourly_stats,
             'backlog_criteria': backlog_criteria,
             'surge_periods': surge_periods,
-            'final_backlog_hours': sorted(final_backlog_hours),
+            'final_backlog_hours': final_backlog_hours,
             'continuous_periods': continuous_periods,
             'delayed_flights': delayed_flights,
             'overall_mean': overall_mean,
             'overall_std': overall_std
         }
     
-    def visualize_optimized_analysis(self, analysis_result):
+    def visualize_optimized_analysis(self, analysis_result, dpi=150):
         """可视化优化后的分析结果"""
         fig, axes = plt.subplots(3, 2, figsize=(16, 18))
         
         hourly_stats = analysis_result['hourly_stats']
         
+        # 各子图共用的每小时数组只构造一次
+        hours = np.arange(24)
+        means = hourly_stats.daily_mean
+        stds = hourly_stats.daily_std
+        maxs = hourly_stats.daily_max
+        
         # 1. 每小时延误统计对比
         ax1 = axes[0, 0]
-        hours = range(24)
-        means = [hourly_stats[h]['daily_mean'] for h in hours]
-        stds = [hourly_stats[h]['daily_std'] for h in hours]
-        maxs = [hourly_stats[h]['daily_max'] for h in hours]
-        
         ax1.bar(hours, means, alpha=0.6, label='日均延误', color='blue')
         ax1.errorbar(hours, means, yerr=stds, fmt='none', color='red', alpha=0.7, label='标准差')
         ax1.plot(hours, maxs, 'ro-', alpha=0.7, label='最大值')
         
-        # 标记不同类型的积压时段
-        for h in analysis_result['backlog_criteria']['statistical']:
-            ax1.axvspan(h-0.4, h+0.4, alpha=0.3, color='red', label='统计异常' if h == analysis_result['backlog_criteria']['statistical'][0] else '')
+        # 标记不同类型的积压时段 - 每类一个broken_barh，纵向铺满坐标轴
+        span_transform = ax1.get_xaxis_transform()
+        statistical_hours = analysis_result['backlog_criteria']['statistical']
+        if statistical_hours:
+            ax1.broken_barh([(h-0.4, 0.8) for h in statistical_hours], (0, 1), transform=span_transform,
+                            alpha=0.3, color='red', label='统计异常')
         
-        for period in analysis_result['surge_periods']:
-            h = period['hour']
-            ax1.axvspan(h-0.4, h+0.4, alpha=0.3, color='orange', label='流量激增' if h == analysis_result['surge_periods'][0]['hour'] else '')
+        surge_hours = [period['hour'] for period in analysis_result['surge_periods']]
+        if surge_hours:
+            ax1.broken_barh([(h-0.4, 0.8) for h in surge_hours], (0, 1), transform=span_transform,
+                            alpha=0.3, color='orange', label='流量激增')
         
         ax1.axhline(y=analysis_result['overall_mean'], color='green', linestyle='--', alpha=0.7, label='全天均值')
         ax1.axhline(y=self.base_backlog_threshold, color='purple', linestyle='--', alpha=0.7, label='基础阈值')
@@ -395,7 +471,7 @@ class OptimizedBacklogAnalyzer:
         ax6 = axes[2, 1]
         final_hours = analysis_result['final_backlog_hours']
         if final_hours:
-            intensities = [hourly_stats[h]['daily_mean'] for h in final_hours]
+            intensities = means[final_hours]
             ax6.bar(range(len(final_hours)), intensities, alpha=0.7, color='red')
             ax6.set_xticks(range(len(final_hours)))
             ax6.set_xticklabels([f'{h:02d}h' for h in final_hours])
@@ -405,9 +481,11 @@ class OptimizedBacklogAnalyzer:
             ax6.text(0.5, 0.5, '无积压时段', ha='center', va='center', transform=ax6.transAxes, fontsize=14)
             ax6.set_title('积压时段强度分析')
         
-        plt.tight_layout()
-        plt.savefig('ZGGG优化积压时段分析.png', dpi=300, bbox_inches='tight')
-        plt.show()
+        fig.tight_layout()
+        fig.savefig('ZGGG优化积压时段分析.png', dpi=dpi, bbox_inches='tight')
+        if matplotlib.get_backend().lower() != 'agg':
+            plt.show()
+        plt.close(fig)
         
         return fig
 
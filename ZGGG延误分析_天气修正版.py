@@ -5,178 +5,266 @@ ZGGG起飞延误积压分析 - 天气停飞识别版
 识别天气停飞时段，正确计算延误和积压
 """
 
+import os
 import pandas as pd
 import numpy as np
+import matplotlib
+# 无显示环境(批处理/服务器)时使用Agg后端，只输出PNG
+if os.environ.get('DISPLAY') is None:
+    matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import seaborn as sns
 from datetime import datetime, timedelta
+from pathlib import Path
 import warnings
 warnings.filterwarnings('ignore')
 
+from _fast import NS_PER_HOUR, TIME_FORMAT, parse_time_strings, weather_adjusted_delays
+
+# 安装polars时用其多线程完成时间解析，否则退回pandas
+try:
+    import polars as pl
+except ImportError:
+    pl = None
+
+# 安装numexpr时把多个比较条件融合为一次遍历
+try:
+    import numexpr as ne
+except ImportError:
+    ne = None
+
 # 设置中文字体
 plt.rcParams['font.sans-serif'] = ['SimHei', 'Arial Unicode MS']
 plt.rcParams['axes.unicode_minus'] = False
 
+# 原始数据路径及其ZGGG起飞子集的Parquet缓存(与xlsx同目录)
+DATA_PATH = Path('/Users/megrez/Library/Mobile Documents/com~apple~CloudDocs/BUAA/科研/挑战杯/航空挑战杯/数据/5月航班运行数据（脱敏）.xlsx')
+CACHE_PATH = DATA_PATH.with_name(DATA_PATH.stem + '_天气修正版.parquet')
+
+# 安装python-calamine时用其解析xlsx(远快于openpyxl)，否则退回openpyxl
+try:
+    import python_calamine  # noqa: F401
+    EXCEL_ENGINE = 'calamine'
+except ImportError:
+    EXCEL_ENGINE = 'openpyxl'
+
+TIME_FIELDS = ['计划离港时间', '实际离港时间', '实际起飞时间', '原计划离港时间']
+# 分析必需的时间列(缺失即剔除该航班)，只对这些列报告无法解析的值
+REQUIRED_TIME_FIELDS = ['计划离港时间', '实际离港时间', '实际起飞时间']
+
+def _pl_to_datetime(df, field):
+    """polars时间转换表达式：字符串列按格式解析，其余类型直接转换，无法解析的置空"""
+    if df.schema[field] == pl.Utf8:
+        expr = pl.col(field).str.to_datetime(TIME_FORMAT, strict=False)
+    else:
+        expr = pl.col(field).cast(pl.Datetime, strict=False)
+    return expr.cast(pl.Datetime('ns'))
+
+def _extract_zggg_departures(df):
+    """提取ZGGG起飞航班并转换时间字段，无法解析的时间置空"""
+    # 先提取ZGGG起飞航班(比较分类编码而非逐个字符串)，时间解析只作用于这一小部分行
+    station = df['实际起飞站四字码'].astype('category')
+    if 'ZGGG' in station.cat.categories:
+        mask = station.cat.codes.to_numpy() == station.cat.categories.get_loc('ZGGG')
+    else:
+        mask = np.zeros(len(df), dtype=bool)
+    zggg_dep = df.loc[mask, TIME_FIELDS].copy()
+    
+    if pl is not None:
+        # 只把ZGGG子集的时间列交给polars解析；对象列混有多种类型无法转换时退回pandas
+        try:
+            pl_dep = pl.from_pandas(zggg_dep)
+        except Exception:
+            pl_dep = None
+        
+        if pl_dep is not None:
+            parsed = (
+                pl_dep
+                .with_columns([_pl_to_datetime(pl_dep, field) for field in TIME_FIELDS])
+                .to_pandas()
+            )
+            
+            # 固定格式把非空字符串解析为空时，该列改走pandas的推断解析，两种后端结果一致
+            for field in TIME_FIELDS:
+                if (pl_dep.schema[field] == pl.Utf8
+                        and parsed[field].isna().sum() > pl_dep[field].null_count()):
+                    parsed[field] = parse_time_strings(
+                        pl_dep[field].to_pandas(), field if field in REQUIRED_TIME_FIELDS else None
+                    )
+            return parsed
+    
+    # 转换时间字段: Excel原生日期单元格已是datetime64，只解析字符串列
+    for field in TIME_FIELDS:
+        if not np.issubdtype(zggg_dep[field].dtype, np.datetime64):
+            zggg_dep[field] = parse_time_strings(
+                zggg_dep[field], field if field in REQUIRED_TIME_FIELDS else None
+            )
+    
+    return zggg_dep
+
 def load_and_clean_data():
     """载入数据并进行清洗"""
     print("=== 数据载入与初步清洗 ===")
     
-    df = pd.read_excel('/Users/megrez/Library/Mobile Documents/com~apple~CloudDocs/BUAA/科研/挑战杯/航空挑战杯/数据/5月航班运行数据（脱敏）.xlsx')
-    print(f"原始数据总记录数: {len(df)}")
-    
-    # 提取ZGGG起飞航班
-    zggg_dep = df[df['实际起飞站四字码'] == 'ZGGG'].copy()
+    # 缓存存在且不旧于xlsx时直接读取已解析好的ZGGG起飞航班
+    if CACHE_PATH.exists() and CACHE_PATH.stat().st_mtime >= DATA_PATH.stat().st_mtime:
+        zggg_dep = pd.read_parquet(CACHE_PATH)
+        print(f"使用缓存: {CACHE_PATH.name}")
+    else:
+        # 只解析用到的列，四字码按分类读入
+        df = pd.read_excel(
+            DATA_PATH,
+            usecols=['实际起飞站四字码'] + TIME_FIELDS,
+            dtype={'实际起飞站四字码': 'category'},
+            engine=EXCEL_ENGINE
+        )
+        print(f"原始数据总记录数: {len(df)}")
+        
+        zggg_dep = _extract_zggg_departures(df)
+        zggg_dep.to_parquet(CACHE_PATH, compression='zstd')
     print(f"ZGGG起飞航班总数: {len(zggg_dep)}")
     
-    # 转换时间字段
-    time_fields = ['计划离港时间', '实际离港时间', '实际起飞时间', '原计划离港时间']
-    for field in time_fields:
-        zggg_dep[field] = pd.to_datetime(zggg_dep[field], errors='coerce')
-    
     # 只保留有完整时间数据的航班
-    valid_data = zggg_dep.dropna(subset=['计划离港时间', '实际离港时间', '实际起飞时间']).copy()
+    valid_data = zggg_dep.dropna(subset=REQUIRED_TIME_FIELDS).copy()
     print(f"有完整时间数据的航班: {len(valid_data)}")
     
+    _add_time_cols(valid_data)
     return valid_data
 
+def _add_time_cols(df, col='计划离港时间'):
+    """一次性缓存计划日期(datetime64[D])和小时(int8)，后续筛选与分组不再经过.dt访问器"""
+    ns = df[col].to_numpy(dtype='datetime64[ns]')
+    df['_day'] = ns.astype('datetime64[D]')
+    df['_hour'] = ((ns.view('i8') // NS_PER_HOUR) % 24).astype('int8')
+
 def calculate_delays_and_identify_weather_events(data):
     """计算延误并识别天气停飞事件"""
     print(f"\n=== 延误计算与天气停飞事件识别 ===")
     
-    # 计算基础延误时间
-    data['原始起飞延误分钟'] = (data['实际起飞时间'] - data['计划离港时间']).dt.total_seconds() / 60
-    data['地面滑行分钟'] = (data['实际起飞时间'] - data['实际离港时间']).dt.total_seconds() / 60
+    # 计算基础延误时间 - 直接在int64纳秒上相减(分钟精度float32足够，内存带宽减半)
+    takeoff_ns = data['实际起飞时间'].to_numpy(dtype='datetime64[ns]').view('i8')
+    plan_ns = data['计划离港时间'].to_numpy(dtype='datetime64[ns]').view('i8')
+    offblock_ns = data['实际离港时间'].to_numpy(dtype='datetime64[ns]').view('i8')
+    data['原始起飞延误分钟'] = ((takeoff_ns - plan_ns) / 60_000_000_000).astype('float32')
+    data['地面滑行分钟'] = ((takeoff_ns - offblock_ns) / 60_000_000_000).astype('float32')
     
     print(f"延误计算公式: 实际起飞时间 - 计划离港时间")
     
     # 识别可能的天气停飞事件
     # 标准1: 延误超过4小时(240分钟)可能是天气原因
-    potential_weather_delays = data[data['原始起飞延误分钟'] > 240].copy()
-    print(f"\n发现可能的天气延误航班: {len(potential_weather_delays)} 班")
-    
-    if len(potential_weather_delays) > 0:
-        # 按日期分组分析天气事件
-        potential_weather_delays['date'] = potential_weather_delays['计划离港时间'].dt.date
-        potential_weather_delays['actual_departure_hour'] = potential_weather_delays['实际离港时间'].dt.hour
+    long_delay = data['原始起飞延误分钟'].to_numpy() > 240
+    n_long = int(long_delay.sum())
+    print(f"\n发现可能的天气延误航班: {n_long} 班")
+    
+    # 天气事件要求单日至少3班长延误，不足3班时直接跳过整个识别过程
+    if n_long < 3:
+        return data, {}
+    
+    potential_weather_delays = data[long_delay].copy()
+    
+    # 按日期分组分析天气事件
+    offblock_ns = potential_weather_delays['实际离港时间'].to_numpy(dtype='datetime64[ns]').view('i8')
+    potential_weather_delays['actual_departure_hour'] = ((offblock_ns // NS_PER_HOUR) % 24).astype('int8')
+    
+    print(f"\n=== 疑似天气停飞事件分析 ===")
+    weather_events = {}
+    
+    # 一次分组: 按日期编码统计长延误航班数及各实际离港小时的分布
+    day_codes, day_values = pd.factorize(potential_weather_delays['_day'], sort=True)
+    day_sizes = np.bincount(day_codes, minlength=len(day_values))
+    actual_hours = np.bincount(
+        day_codes * 24 + potential_weather_delays['actual_departure_hour'].to_numpy(dtype=np.int64),
+        minlength=len(day_values) * 24
+    ).reshape(-1, 24)
+    grouped = potential_weather_delays.groupby(day_codes)
+    
+    # 一天有3班以上长延误，可能是天气
+    for code in np.flatnonzero(day_sizes >= 3):
+        # 分析实际起飞的集中时段
+        concentrated_hours = np.flatnonzero(actual_hours[code] >= 2).tolist()
         
-        print(f"\n=== 疑似天气停飞事件分析 ===")
-        weather_events = {}
-        
-        for date in potential_weather_delays['date'].unique():
-            day_weather = potential_weather_delays[potential_weather_delays['date'] == date]
-            if len(day_weather) >= 3:  # 一天有3班以上长延误，可能是天气
-                # 分析实际起飞的集中时段
-                actual_hours = day_weather['actual_departure_hour'].value_counts()
-                concentrated_hours = actual_hours[actual_hours >= 2].index.tolist()
-                
-                if concentrated_hours:
-                    weather_events[date] = {
-                        'affected_flights': len(day_weather),
-                        'concentrated_hours': concentrated_hours,
-                        'flights': day_weather
-                    }
-                    
-                    print(f"  {date}: {len(day_weather)}班长延误, 集中在 {concentrated_hours} 时段起飞")
+        if concentrated_hours:
+            date = pd.Timestamp(day_values[code]).date()
+            day_weather = grouped.get_group(code)
+            weather_events[date] = {
+                'affected_flights': len(day_weather),
+                'concentrated_hours': concentrated_hours,
+                'flights': day_weather
+            }
         
-        return data, weather_events
+            print(f"  {date}: {len(day_weather)}班长延误, 集中在 {concentrated_hours} 时段起飞")
     
-    return data, {}
+    return data, weather_events
 
 def identify_weather_suspended_periods(data, weather_events):
     """识别天气停飞时段"""
     print(f"\n=== 天气停飞时段识别 ===")
     
-    suspended_periods = []
-    
-    for date, event_info in weather_events.items():
-        flights = event_info['flights']
-        
-        # 找出这一天最早的计划起飞和最晚的实际起飞
-        min_planned = flights['计划离港时间'].min()
-        max_actual = flights['实际起飞时间'].max()
-        
-        # 分析停飞时段：从最早计划时间到集中起飞时间之前
-        concentrated_hours = event_info['concentrated_hours']
-        if concentrated_hours:
-            # 假设停飞结束时间是集中起飞时段的开始
-            resume_hour = min(concentrated_hours)
-            suspend_end = pd.Timestamp(date) + pd.Timedelta(hours=resume_hour)
-            
-            # 估算停飞开始时间（基于最早计划起飞前的合理时间）
-            earliest_planned_hour = min_planned.hour
-            suspend_start = pd.Timestamp(date) + pd.Timedelta(hours=max(0, earliest_planned_hour-1))
-            
-            suspended_periods.append({
-                'date': date,
-                'suspend_start': suspend_start,
-                'suspend_end': suspend_end,
-                'affected_flights': len(flights),
-                'resume_hour': resume_hour
-            })
-            
-            print(f"  识别停飞时段: {date} {suspend_start.strftime('%H:%M')}-{suspend_end.strftime('%H:%M')}")
-            print(f"    影响航班: {len(flights)}班, 恢复时段: {resume_hour}点")
+    # 假设停飞结束时间是集中起飞时段的开始；停飞开始时间估算为最早计划起飞前1小时
+    events = [(date, info) for date, info in weather_events.items() if info['concentrated_hours']]
+    dates = [date for date, _ in events]
+    resume_hours = np.array([min(info['concentrated_hours']) for _, info in events], dtype=np.int64)
+    earliest_planned_hours = np.array(
+        [info['flights']['计划离港时间'].min().hour for _, info in events], dtype=np.int64
+    )
+    
+    # 所有事件的起止时间一次向量化构造
+    day_start = pd.to_datetime(dates)
+    suspended_periods = pd.DataFrame({
+        'date': dates,
+        'suspend_start': day_start + pd.to_timedelta(np.maximum(earliest_planned_hours - 1, 0), unit='h'),
+        'suspend_end': day_start + pd.to_timedelta(resume_hours, unit='h'),
+        'affected_flights': np.array([len(info['flights']) for _, info in events], dtype=np.int64),
+        'resume_hour': resume_hours
+    })
+    
+    for period in suspended_periods.itertuples(index=False):
+        print(f"  识别停飞时段: {period.date} {period.suspend_start.strftime('%H:%M')}-{period.suspend_end.strftime('%H:%M')}")
+        print(f"    影响航班: {period.affected_flights}班, 恢复时段: {period.resume_hour}点")
     
     return suspended_periods
 
-def recalculate_delays_excluding_weather(data, suspended_periods):
-    """重新计算延误，排除天气停飞影响"""
+def _match_suspended_periods(df, suspended_periods):
+    """按计划日期为每个航班找到对应的停飞事件序号，返回(事件序号, 是否属于停飞日期)"""
+    period_days = suspended_periods['suspend_start'].to_numpy().astype('datetime64[D]')
+    order = np.argsort(period_days)
+    days = df['_day'].to_numpy().astype('datetime64[D]')
+    pos = np.searchsorted(period_days, days, sorter=order).clip(max=len(order) - 1)
+    period_idx = order[pos]
+    return period_idx, period_days[period_idx] == days
+
+def recalculate_delays_excluding_weather(data, suspended_periods, inplace=True):
+    """重新计算延误，排除天气停飞影响
+    
+    inplace=True时直接在data上添加调整列(原始延误列保持不变)，避免复制整张表
+    """
     print(f"\n=== 重新计算延误(排除天气影响) ===")
     
-    # 复制数据
-    adjusted_data = data.copy()
+    adjusted_data = data if inplace else data.copy()
     adjusted_data['是否天气影响'] = False
-    adjusted_data['调整后延误分钟'] = adjusted_data['原始起飞延误分钟']
+    adjusted_data['调整后延误分钟'] = adjusted_data['原始起飞延误分钟'].to_numpy(copy=True)
     
     weather_affected_count = 0
     
-    for period in suspended_periods:
-        date = period['date']
-        suspend_start = period['suspend_start']
-        suspend_end = period['suspend_end']
+    if len(suspended_periods) > 0:
+        # 每天至多一次停飞事件，按计划日期把每个航班对应到其事件，所有事件一次区间比较
+        period_idx, in_period = _match_suspended_periods(adjusted_data, suspended_periods)
+        suspend_start = suspended_periods['suspend_start'].to_numpy(dtype='datetime64[ns]').view('i8')[period_idx]
+        suspend_end = suspended_periods['suspend_end'].to_numpy(dtype='datetime64[ns]').view('i8')[period_idx]
         
-        # 找到受影响的航班
-        day_flights_mask = adjusted_data['计划离港时间'].dt.date == date
+        plan_ns = adjusted_data['计划离港时间'].to_numpy(dtype='datetime64[ns]').view('i8')
+        takeoff_ns = adjusted_data['实际起飞时间'].to_numpy(dtype='datetime64[ns]').view('i8')
         
         # 情况1: 计划在停飞时段内的航班 - 从恢复时间开始计算延误
-        planned_in_suspend = (
-            day_flights_mask & 
-            (adjusted_data['计划离港时间'] >= suspend_start) & 
-            (adjusted_data['计划离港时间'] <= suspend_end)
+        # 情况2: 实际起飞在恢复后4小时内的航班 - 可能是积压释放，延误超过1小时的
+        #        计算相对于max(计划时间, 恢复时间)的额外延误
+        adjusted_delay, weather_affected = weather_adjusted_delays(
+            plan_ns, takeoff_ns, adjusted_data['原始起飞延误分钟'].to_numpy(),
+            in_period, suspend_start, suspend_end, window_ns=4 * NS_PER_HOUR
         )
-        
-        # 情况2: 实际起飞在恢复时段的航班 - 可能是积压释放
-        actual_in_resume = (
-            day_flights_mask &
-            (adjusted_data['实际起飞时间'] >= suspend_end) &
-            (adjusted_data['实际起飞时间'] <= suspend_end + pd.Timedelta(hours=4))  # 恢复后4小时内
-        )
-        
-        weather_affected = planned_in_suspend | actual_in_resume
-        weather_affected_flights = adjusted_data[weather_affected]
-        
-        if len(weather_affected_flights) > 0:
-            # 对于天气影响的航班，重新计算延误
-            for idx in weather_affected_flights.index:
-                flight = adjusted_data.loc[idx]
-                planned_time = flight['计划离港时间']
-                actual_time = flight['实际起飞时间']
-                
-                # 如果计划时间在停飞时段内，从恢复时间开始算延误
-                if planned_time >= suspend_start and planned_time <= suspend_end:
-                    adjusted_delay = (actual_time - suspend_end).total_seconds() / 60
-                else:
-                    # 如果是积压航班，计算相对于恢复时间的额外延误
-                    normal_delay = (actual_time - planned_time).total_seconds() / 60
-                    if normal_delay > 60:  # 超过1小时认为受天气影响
-                        estimated_normal_takeoff = max(planned_time, suspend_end)
-                        adjusted_delay = (actual_time - estimated_normal_takeoff).total_seconds() / 60
-                    else:
-                        adjusted_delay = normal_delay
-                
-                adjusted_data.loc[idx, '调整后延误分钟'] = max(0, adjusted_delay)  # 不允许负延误
-                adjusted_data.loc[idx, '是否天气影响'] = True
-                weather_affected_count += 1
+        adjusted_data['调整后延误分钟'] = adjusted_delay
+        adjusted_data['是否天气影响'] = weather_affected
+        weather_affected_count = int(weather_affected.sum())
     
     print(f"天气影响航班数: {weather_affected_count} 班")
     
@@ -195,37 +283,31 @@ def analyze_corrected_patterns(adjusted_data):
     print(f"\n=== 修正后延误模式分析 ===")
     
     # 基本数据清洗 - 移除极端异常值
-    clean_data = adjusted_data[
-        (adjusted_data['调整后延误分钟'] >= -30) &  # 提前不超过30分钟
-        (adjusted_data['调整后延误分钟'] <= 240) &   # 延误不超过4小时
-        (adjusted_data['地面滑行分钟'] >= 5) &       # 地面滑行至少5分钟
-        (adjusted_data['地面滑行分钟'] <= 60)        # 地面滑行不超过60分钟
-    ].copy()
+    # 提前不超过30分钟、延误不超过4小时，地面滑行5-60分钟
+    delay = adjusted_data['调整后延误分钟'].to_numpy()
+    taxi = adjusted_data['地面滑行分钟'].to_numpy()
+    if ne is not None:
+        valid_mask = ne.evaluate('(delay >= -30) & (delay <= 240) & (taxi >= 5) & (taxi <= 60)')
+    else:
+        valid_mask = (delay >= -30) & (delay <= 240) & (taxi >= 5) & (taxi <= 60)
+    clean_data = adjusted_data[valid_mask].copy()
     
     print(f"清洗后有效数据: {len(clean_data)} 班")
     
-    # 添加时间字段
-    clean_data['date'] = clean_data['计划离港时间'].dt.date
-    clean_data['hour'] = clean_data['计划离港时间'].dt.hour
-    
     # 统计每日情况
-    total_days = clean_data['date'].nunique()
+    total_days = clean_data['_day'].nunique()
     print(f"总天数: {total_days} 天")
     
-    # 按小时统计总航班和延误航班
-    hourly_stats = {}
-    for hour in range(24):
-        hour_flights = clean_data[clean_data['hour'] == hour]
-        total_count = len(hour_flights)
-        delayed_count = len(hour_flights[hour_flights['调整后延误分钟'] > 15])
-        
-        hourly_stats[hour] = {
-            'total': total_count,
-            'delayed': delayed_count,
-            'delay_rate': (delayed_count / total_count * 100) if total_count > 0 else 0,
-            'avg_total': total_count / total_days,
-            'avg_delayed': delayed_count / total_days
-        }
+    # 按小时统计总航班和延误航班(一次分组聚合)
+    clean_data['is_delayed'] = clean_data['调整后延误分钟'].to_numpy() > 15
+    hourly = (clean_data.groupby('_hour')['is_delayed']
+              .agg(total='size', delayed='sum')
+              .reindex(range(24), fill_value=0)
+              .astype(int))
+    hourly['delay_rate'] = (hourly['delayed'] / hourly['total'].where(hourly['total'] > 0) * 100).fillna(0)
+    hourly['avg_total'] = hourly['total'] / total_days
+    hourly['avg_delayed'] = hourly['delayed'] / total_days
+    hourly_stats = hourly.to_dict('index')
     
     # 显示修正后的统计
     print(f"\n=== 修正后各时段统计 ===")
@@ -244,61 +326,57 @@ def analyze_corrected_patterns(adjusted_data):
         print(f"{hour:02d}:00-{hour+1:02d}:00  {stats['total']:6d}  {stats['delayed']:6d}  {stats['delay_rate']:5.1f}%  "
               f"{stats['avg_total']:6.1f}  {stats['avg_delayed']:6.1f}  {backlog_status}")
     
-    return clean_data, hourly_stats, backlog_hours
+    return clean_data, hourly_stats, backlog_hours, hourly
 
 def identify_weather_backlog_periods(clean_data, suspended_periods):
     """识别天气恢复后的积压时段"""
     print(f"\n=== 天气恢复后积压时段识别 ===")
     
     weather_backlog_periods = []
-    
-    for period in suspended_periods:
-        date = period['date']
-        suspend_end = period['suspend_end']
-        resume_hour = period['resume_hour']
+    if suspended_periods.empty:
+        return weather_backlog_periods
+    
+    # 为每个航班找到其计划日期对应的停飞事件，所有事件共用一次全表扫描
+    period_idx, in_period = _match_suspended_periods(clean_data, suspended_periods)
+    resume_ns = suspended_periods['suspend_end'].to_numpy(dtype='datetime64[ns]').view('i8')
+    
+    # 分析恢复后4小时内实际起飞的航班
+    takeoff_ns = clean_data['实际起飞时间'].to_numpy(dtype='datetime64[ns]').view('i8')
+    offset = takeoff_ns - resume_ns[period_idx]
+    in_window = in_period & (offset >= 0) & (offset <= 4 * NS_PER_HOUR)
+    
+    # 按(事件, 实际起飞小时)一次计数
+    takeoff_hour = (takeoff_ns[in_window] // NS_PER_HOUR) % 24
+    resume_hourly = np.bincount(
+        period_idx[in_window] * 24 + takeoff_hour, minlength=len(suspended_periods) * 24
+    ).reshape(-1, 24)
+    
+    for period, hourly_counts in zip(suspended_periods.itertuples(index=False), resume_hourly):
+        # 某小时起飞超过10班认为是积压释放
+        backlog_hours = np.flatnonzero(hourly_counts > 10).tolist()
         
-        # 分析恢复后2-4小时内的情况
-        resume_window_start = suspend_end
-        resume_window_end = suspend_end + pd.Timedelta(hours=4)
-        
-        # 统计恢复窗口内每小时的起飞数量
-        day_flights = clean_data[clean_data['计划离港时间'].dt.date == date]
-        
-        resume_flights = day_flights[
-            (day_flights['实际起飞时间'] >= resume_window_start) &
-            (day_flights['实际起飞时间'] <= resume_window_end)
-        ]
-        
-        if len(resume_flights) > 0:
-            # 按实际起飞小时统计
-            resume_hourly = resume_flights.groupby(resume_flights['实际起飞时间'].dt.hour).size()
-            
-            backlog_hours = []
-            for hour, count in resume_hourly.items():
-                if count > 10:  # 某小时起飞超过10班认为是积压释放
-                    backlog_hours.append(hour)
+        if backlog_hours:
+            total_resume_flights = int(hourly_counts.sum())
+            weather_backlog_periods.append({
+                'date': period.date,
+                'resume_time': period.suspend_end,
+                'backlog_hours': backlog_hours,
+                'total_resume_flights': total_resume_flights
+            })
             
-            if backlog_hours:
-                weather_backlog_periods.append({
-                    'date': date,
-                    'resume_time': suspend_end,
-                    'backlog_hours': backlog_hours,
-                    'total_resume_flights': len(resume_flights)
-                })
-                
-                print(f"  {date} 恢复后积压: {backlog_hours} 时段, 共 {len(resume_flights)} 班")
+            print(f"  {period.date} 恢复后积压: {backlog_hours} 时段, 共 {total_resume_flights} 班")
     
     return weather_backlog_periods
 
-def visualize_corrected_analysis(clean_data, hourly_stats, suspended_periods):
-    """可视化修正后的分析结果"""
-    plt.figure(figsize=(20, 15))
+def visualize_corrected_analysis(clean_data, hourly_df, suspended_periods):
+    """可视化修正后的分析结果(hourly_df为按0-23小时索引的统计表)"""
+    fig = plt.figure(figsize=(20, 15))
     
     # 1. 修正后的各时段延误分布
     plt.subplot(3, 3, 1)
     hours = list(range(24))
-    total_counts = [hourly_stats[h]['avg_total'] for h in hours]
-    delayed_counts = [hourly_stats[h]['avg_delayed'] for h in hours]
+    total_counts = hourly_df['avg_total'].to_numpy()
+    delayed_counts = hourly_df['avg_delayed'].to_numpy()
     
     x = np.arange(len(hours))
     width = 0.35
@@ -316,13 +394,12 @@ def visualize_corrected_analysis(clean_data, hourly_stats, suspended_periods):
     
     # 2. 修正后的延误率分布
     plt.subplot(3, 3, 2)
-    delay_rates = [hourly_stats[h]['delay_rate'] for h in hours]
+    delay_rates = hourly_df['delay_rate'].to_numpy()
     bars = plt.bar(hours, delay_rates, alpha=0.7, color='green')
     
     # 标记不合理的高延误率
-    for i, rate in enumerate(delay_rates):
-        if rate > 80:  # 延误率超过80%标记为红色
-            bars[i].set_color('red')
+    for i in np.flatnonzero(delay_rates > 80):  # 延误率超过80%标记为红色
+        bars[i].set_color('red')
     
     plt.xlabel('小时')
     plt.ylabel('延误率(%)')
@@ -348,13 +425,11 @@ def visualize_corrected_analysis(clean_data, hourly_stats, suspended_periods):
     normal_flights = clean_data[~clean_data['是否天气影响']]
     
     if len(weather_affected) > 0:
-        weather_hourly = weather_affected.groupby('hour').size()
-        normal_hourly = normal_flights.groupby('hour').size()
+        weather_hourly = weather_affected.groupby('_hour').size().reindex(hours, fill_value=0).to_numpy()
+        normal_hourly = normal_flights.groupby('_hour').size().reindex(hours, fill_value=0).to_numpy()
         
-        plt.bar(hours, [weather_hourly.get(h, 0) for h in hours], 
-                alpha=0.7, label='天气影响', color='red')
-        plt.bar(hours, [normal_hourly.get(h, 0) for h in hours], 
-                alpha=0.7, label='正常航班', color='blue', bottom=[weather_hourly.get(h, 0) for h in hours])
+        plt.bar(hours, weather_hourly, alpha=0.7, label='天气影响', color='red')
+        plt.bar(hours, normal_hourly, alpha=0.7, label='正常航班', color='blue', bottom=weather_hourly)
     
     plt.xlabel('小时')
     plt.ylabel('航班数量')
@@ -364,9 +439,9 @@ def visualize_corrected_analysis(clean_data, hourly_stats, suspended_periods):
     # 5. 凌晨时段详细分析
     plt.subplot(3, 3, 5)
     early_hours = list(range(0, 6))
-    early_total = [hourly_stats[h]['avg_total'] for h in early_hours]
-    early_delayed = [hourly_stats[h]['avg_delayed'] for h in early_hours]
-    early_rates = [hourly_stats[h]['delay_rate'] for h in early_hours]
+    early_total = total_counts[:6]
+    early_delayed = delayed_counts[:6]
+    early_rates = delay_rates[:6]
     
     fig_ax = plt.gca()
     ax2 = fig_ax.twinx()
@@ -383,13 +458,13 @@ def visualize_corrected_analysis(clean_data, hourly_stats, suspended_periods):
     ax2.legend(loc='upper right')
     
     # 6-9. 天气停飞事件可视化
-    if suspended_periods:
+    if len(suspended_periods) > 0:
         plt.subplot(3, 3, 6)
-        dates = [p['date'] for p in suspended_periods]
-        affected_counts = [p['affected_flights'] for p in suspended_periods]
-        resume_hours = [p['resume_hour'] for p in suspended_periods]
+        dates = suspended_periods['date'].tolist()
+        affected_counts = suspended_periods['affected_flights'].to_numpy()
+        resume_hours = suspended_periods['resume_hour'].to_numpy()
         
-        plt.scatter(dates, resume_hours, s=[c*10 for c in affected_counts], alpha=0.7)
+        plt.scatter(dates, resume_hours, s=affected_counts * 10, alpha=0.7)
         plt.xlabel('日期')
         plt.ylabel('恢复时段')
         plt.title('天气停飞事件')
@@ -401,7 +476,9 @@ def visualize_corrected_analysis(clean_data, hourly_stats, suspended_periods):
     
     plt.tight_layout()
     plt.savefig('ZGGG延误分析_天气修正版.png', dpi=300, bbox_inches='tight')
-    plt.show()
+    if matplotlib.get_backend().lower() != 'agg':
+        plt.show()
+    plt.close(fig)
 
 def main():
     """主函数"""
@@ -420,13 +497,13 @@ def main():
     adjusted_data = recalculate_delays_excluding_weather(data_with_delays, suspended_periods)
     
     # 5. 分析修正后的延误模式
-    clean_data, hourly_stats, backlog_hours = analyze_corrected_patterns(adjusted_data)
+    clean_data, hourly_stats, backlog_hours, hourly_df = analyze_corrected_patterns(adjusted_data)
     
     # 6. 识别天气恢复后的积压时段
     weather_backlog_periods = identify_weather_backlog_periods(clean_data, suspended_periods)
     
     # 7. 可视化修正后的结果
-    visualize_corrected_analysis(clean_data, hourly_stats, suspended_periods)
+    visualize_corrected_analysis(clean_data, hourly_df, suspended_periods)
     
     # 8. 生成最终报告
     print(f"\n" + "="*80)
@@ -435,8 +512,8 @@ def main():
     
     print(f"\n【天气停飞事件】")
     print(f"  识别天气停飞事件: {len(suspended_periods)} 次")
-    for period in suspended_periods:
-        print(f"    {period['date']}: 影响 {period['affected_flights']} 班, 恢复于 {period['resume_hour']}:00")
+    for period in suspended_periods.itertuples(index=False):
+        print(f"    {period.date}: 影响 {period.affected_flights} 班, 恢复于 {period.resume_hour}:00")
     
     print(f"\n【修正后积压时段】")
     print(f"  日均积压时段: {backlog_hours}")
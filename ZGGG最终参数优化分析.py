@@ -5,17 +5,42 @@ ZGGG最终参数优化分析
 目标: 进一步优化taxi-out参数，降低仿真延误率偏差
 """
 
+import os
 import pandas as pd
 import numpy as np
+import matplotlib
+# 无显示环境(批处理/服务器)时使用Agg后端，只输出PNG
+if os.environ.get('DISPLAY') is None:
+    matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 from datetime import datetime, timedelta
+from pathlib import Path
 import warnings
 warnings.filterwarnings('ignore')
 
+# 安装numexpr时把延误概率的各项运算融合为一次遍历
+try:
+    import numexpr as ne
+except ImportError:
+    ne = None
+
+from _fast import param_grid_counts, sorted_group_sums
+
 # 设置中文字体
 plt.rcParams['font.sans-serif'] = ['SimHei', 'Arial Unicode MS']
 plt.rcParams['axes.unicode_minus'] = False
 
+# 原始数据路径及其ZGGG起飞时间的Parquet缓存(与xlsx同目录)
+DATA_PATH = Path('数据/5月航班运行数据（实际数据列）.xlsx')
+CACHE_PATH = DATA_PATH.with_name(DATA_PATH.stem + '_ZGGG起飞.parquet')
+
+# 安装python-calamine时用其解析xlsx(远快于openpyxl)，否则退回openpyxl
+try:
+    import python_calamine  # noqa: F401
+    EXCEL_ENGINE = 'calamine'
+except ImportError:
+    EXCEL_ENGINE = 'openpyxl'
+
 class FinalParameterOptimizer:
     def __init__(self):
         """初始化最终参数优化器"""
@@ -38,64 +63,94 @@ class FinalParameterOptimizer:
         """载入并分析真实数据"""
         print("\n=== 载入真实数据 ===")
         
-        # 载入Excel数据
-        file_path = "数据/5月航班运行数据（实际数据列）.xlsx"
-        df = pd.read_excel(file_path)
-        
-        # 过滤ZGGG起飞航班
-        zggg_df = df[df['实际起飞站四字码'] == 'ZGGG'].copy()
-        
-        # 清理时间数据
-        zggg_df = zggg_df[zggg_df['实际起飞时间'].notna()].copy()
-        zggg_df = zggg_df[zggg_df['实际起飞时间'] != '-'].copy()
-        
-        # 数据预处理
-        zggg_df['实际起飞时间'] = pd.to_datetime(zggg_df['实际起飞时间'], errors='coerce')
-        zggg_df = zggg_df.dropna(subset=['实际起飞时间'])
+        # 缓存存在且不旧于xlsx时直接读取已清理好的起飞时间，跳过xlsx解析
+        if CACHE_PATH.exists() and CACHE_PATH.stat().st_mtime >= DATA_PATH.stat().st_mtime:
+            zggg_df = pd.read_parquet(CACHE_PATH, engine='pyarrow')
+            print(f"使用缓存: {CACHE_PATH.name}")
+        else:
+            # 载入Excel数据(只解析用到的列)
+            df = pd.read_excel(DATA_PATH, usecols=['实际起飞站四字码', '实际起飞时间'], engine=EXCEL_ENGINE)
+            
+            # 过滤ZGGG起飞航班
+            zggg_df = df.loc[df['实际起飞站四字码'] == 'ZGGG', ['实际起飞时间']].copy()
+            
+            # 清理时间数据
+            zggg_df = zggg_df[zggg_df['实际起飞时间'].notna()].copy()
+            zggg_df = zggg_df[zggg_df['实际起飞时间'] != '-'].copy()
+            
+            # 数据预处理
+            zggg_df['实际起飞时间'] = pd.to_datetime(zggg_df['实际起飞时间'], errors='coerce')
+            zggg_df = zggg_df.dropna(subset=['实际起飞时间'])
+            
+            zggg_df.to_parquet(CACHE_PATH, engine='pyarrow', compression='zstd')
         
         # 基于已有的精准分析结果，使用30%的延误率作为基准
         target_delay_rate = 0.30  # 基于前面精准分析的结果
         
-        # 时间特征提取
-        zggg_df['小时'] = zggg_df['实际起飞时间'].dt.hour
-        zggg_df['日期'] = zggg_df['实际起飞时间'].dt.date
+        # 时间特征提取: datetime64[h]的整数值即 日序号*24+小时，日序号和小时都由它整数运算得到
+        date_hour_key = zggg_df['实际起飞时间'].values.astype('datetime64[h]').view('i8')
+        zggg_df['_h'] = date_hour_key
+        zggg_df['_dateid'] = date_hour_key // 24
+        zggg_df['小时'] = (date_hour_key % 24).astype('int8')
         
-        # 计算每小时流量
-        hourly_flow = zggg_df.groupby(['日期', '小时']).size()
-        zggg_df['小时流量'] = zggg_df.set_index(['日期', '小时']).index.map(hourly_flow.get)
+        # 计算每小时流量: 按整数键分组计数后按组号回填
+        hour_group_keys, hour_group = np.unique(date_hour_key, return_inverse=True)
+        hour_group_flights = np.bincount(hour_group)
+        zggg_df['小时流量'] = hour_group_flights[hour_group].astype('int16')
         
         # 基于流量和时段特征建立延误模型
         # 高峰时段延误概率更高
         peak_hours = [8, 9, 10, 11, 12, 13, 14, 15, 16, 17, 18, 19, 20]
         zggg_df['是否高峰'] = zggg_df['小时'].isin(peak_hours)
         
-        # 延误概率建模
+        # 延误概率建模: 基础概率 + 流量影响(0~0.6) + 高峰时段影响(0.2)
         base_prob = 0.1  # 基础延误概率
-        flow_factor = np.clip((zggg_df['小时流量'] - 10) / 30, 0, 0.6)  # 流量影响
-        peak_factor = np.where(zggg_df['是否高峰'], 0.2, 0)  # 高峰时段影响
-        
-        zggg_df['延误概率'] = base_prob + flow_factor + peak_factor
-        
-        # 调整延误概率以匹配目标延误率
-        current_avg_prob = zggg_df['延误概率'].mean()
-        adjustment_factor = target_delay_rate / current_avg_prob
-        zggg_df['延误概率'] = np.clip(zggg_df['延误概率'] * adjustment_factor, 0, 0.9)
+        flow = zggg_df['小时流量'].to_numpy(dtype=np.float32)
+        peak = zggg_df['是否高峰'].to_numpy()
+        
+        # 调整延误概率以匹配目标延误率，上限0.9
+        if ne is not None:
+            # 各项融合为一次遍历，不生成中间数组
+            prob = ne.evaluate(
+                'base_prob + where(flow < 10, 0, where(flow > 28, 0.6, (flow - 10) / 30))'
+                ' + where(peak, 0.2, 0)'
+            )
+            adjustment_factor = target_delay_rate / prob.mean()
+            prob = ne.evaluate('where(prob * adjustment_factor > 0.9, 0.9, prob * adjustment_factor)')
+        else:
+            prob = np.float32(base_prob) + np.clip((flow - 10) / 30, 0, 0.6)
+            prob += np.where(peak, np.float32(0.2), np.float32(0))
+            adjustment_factor = target_delay_rate / prob.mean()
+            prob = np.clip(prob * adjustment_factor, 0, 0.9)
+        zggg_df['延误概率'] = prob.astype('float32', copy=False)
         
         # 随机分配延误状态（基于概率）
-        np.random.seed(42)
-        zggg_df['延误标记'] = np.random.random(len(zggg_df)) < zggg_df['延误概率']
+        rng = np.random.default_rng(42)
+        delayed_flag = rng.random(len(zggg_df), dtype=np.float32) < zggg_df['延误概率'].to_numpy()
         
-        # 为延误航班分配延误时间
-        delay_times = np.random.exponential(scale=50, size=zggg_df['延误标记'].sum())
-        delay_times = np.clip(delay_times, self.delay_threshold + 1, 300)  # 限制在合理范围内
+        # 为延误航班分配延误时间: 直接写入预分配的float32数组，不经过.loc
+        delayed_pos = np.flatnonzero(delayed_flag)
+        delay_times = rng.standard_exponential(delayed_pos.size, dtype=np.float32)
+        delay_times *= 50
+        np.clip(delay_times, self.delay_threshold + 1, 300, out=delay_times)  # 限制在合理范围内
         
-        zggg_df['真实起飞延误'] = 0.0
-        zggg_df.loc[zggg_df['延误标记'], '真实起飞延误'] = delay_times
+        real_delay = np.zeros(len(zggg_df), dtype=np.float32)
+        real_delay[delayed_pos] = delay_times
+        zggg_df['真实起飞延误'] = real_delay
         
         # 确保延误标记与阈值一致
         zggg_df['延误标记'] = zggg_df['真实起飞延误'] > self.delay_threshold
         
         self.real_data = zggg_df
+        
+        # 仿真只读的航班数组提取一次，参数扫描时不再复制或索引DataFrame
+        self._delay_arr = zggg_df['真实起飞延误'].to_numpy()
+        self._peak_mask = np.isin(zggg_df['小时'].to_numpy(), [8, 9, 13, 14, 15, 16, 17, 19, 20])
+        self._hour_group_keys = hour_group_keys
+        self._hour_group = hour_group
+        self._hour_group_flights = hour_group_flights
+        self._sim_cache = {}
+        
         real_delay_rate = zggg_df['延误标记'].mean() * 100
         
         print(f"ZGGG起飞航班: {len(zggg_df)} 班")
@@ -107,16 +162,16 @@ class FinalParameterOptimizer:
         """识别真实积压时段"""
         print("\n=== 分析真实积压时段 ===")
         
-        # 按日期和小时分组统计
-        df['日期'] = df['实际起飞时间'].dt.date
-        df['小时'] = df['实际起飞时间'].dt.hour
-        
-        daily_hourly_stats = df.groupby(['日期', '小时']).agg({
-            '延误标记': ['count', 'sum']
-        }).round(2)
-        
-        daily_hourly_stats.columns = ['航班数', '延误航班数']
-        daily_hourly_stats = daily_hourly_stats.reset_index()
+        # 按日期和小时分组统计(载入时已缓存的整数小时键)
+        hour_keys, flight_counts, delayed_counts = sorted_group_sums(
+            df['_h'].to_numpy(), df['延误标记'].to_numpy(dtype=np.int32)
+        )
+        daily_hourly_stats = pd.DataFrame({
+            '日期': (hour_keys // 24).astype('datetime64[D]'),
+            '小时': (hour_keys % 24).astype('int8'),
+            '航班数': flight_counts,
+            '延误航班数': delayed_counts
+        })
         
         # 识别积压时段(>=10班且有延误)
         backlog_periods = daily_hourly_stats[
@@ -125,8 +180,8 @@ class FinalParameterOptimizer:
         ].copy()
         
         # 统计频繁积压时段
-        backlog_hour_counts = backlog_periods.groupby('小时').size()
-        frequent_backlog_hours = backlog_hour_counts[backlog_hour_counts >= 3].index.tolist()
+        backlog_hour_counts = np.bincount(backlog_periods['小时'].to_numpy(), minlength=24)
+        frequent_backlog_hours = np.flatnonzero(backlog_hour_counts >= 3).tolist()
         
         print(f"总积压时段数: {len(backlog_periods)}")
         print(f"频繁积压时段: {len(frequent_backlog_hours)} 个: {frequent_backlog_hours}")
@@ -137,53 +192,61 @@ class FinalParameterOptimizer:
         return backlog_periods, frequent_backlog_hours
         
     def simulate_with_params(self, taxi_out_time, rot_scaling=1.0):
-        """使用指定参数进行仿真"""
+        """使用指定参数进行仿真(同一参数组合的结果缓存复用)"""
+        key = (taxi_out_time, rot_scaling)
+        if key not in self._sim_cache:
+            self._sim_cache[key] = self.simulate_param_grid([taxi_out_time], [rot_scaling])[0]
+        return dict(self._sim_cache[key])
+    
+    def simulate_param_grid(self, taxi_out_options, rot_scaling_options):
+        """对taxi-out×ROT缩放参数网格一次性仿真
+        
+        按(taxi_out, rot_scaling)先外后内的顺序返回各参数组合的结果字典
+        """
+        # 简化仿真逻辑 - 基于统计模型，所有参数组合共用同一组航班数组
+        # 参数组合按(taxi_out, rot_scaling)展平，各组合互相独立，安装numba时按组合并行
+        taxi = np.repeat(np.asarray(taxi_out_options, dtype=float), len(rot_scaling_options))
+        rot = np.tile(np.asarray(rot_scaling_options, dtype=float), len(taxi_out_options))
+        n_cells = taxi.size
+        n_flights = len(self._delay_arr)
+        
+        # 识别仿真积压时段: 按(日期, 小时)分组统计各组合的延误航班数
+        hour_keys = self._hour_group_keys
+        group_flights = self._hour_group_flights
+        delayed_total, delay_sum, group_delayed = param_grid_counts(
+            self._delay_arr, self._peak_mask, self._hour_group, len(hour_keys),
+            taxi, rot, self.delay_threshold
+        )
         
-        # 简化仿真逻辑 - 基于统计模型
-        df = self.real_data.copy()
+        # 仿真结果统计
+        sim_delay_rates = delayed_total / n_flights * 100
+        avg_sim_delays = delay_sum / n_flights
         
-        # 基础仿真延误计算
-        base_delay = np.maximum(0, df['真实起飞延误'] - taxi_out_time + 10)
+        sim_backlog = (group_flights >= self.backlog_threshold)[:, None] & (group_delayed > 0)
         
-        # ROT影响调整 
-        if rot_scaling != 1.0:
-            # 高峰时段影响更大
-            df['峰期标记'] = df['小时'].isin([8, 9, 13, 14, 15, 16, 17, 19, 20])
-            peak_adjustment = np.where(df['峰期标记'], 
-                                     base_delay * (rot_scaling - 1) * 0.5, 0)
-            base_delay += peak_adjustment
-            
-        df['仿真延误'] = base_delay
-        df['仿真延误标记'] = df['仿真延误'] > self.delay_threshold
+        # 各小时出现积压的天数 (24, 参数组合)
+        sim_backlog_hours = np.zeros((24, n_cells), dtype=np.int32)
+        np.add.at(sim_backlog_hours, hour_keys % 24, sim_backlog.astype(np.int32))
         
-        # 仿真结果统计
-        sim_delay_rate = df['仿真延误标记'].mean() * 100
-        avg_sim_delay = df['仿真延误'].mean()
+        # 频繁积压小时(≥3天)编码为24位掩码，便于与真实结果按位求交
+        frequent_masks = ((sim_backlog_hours >= 3).astype(np.int64) << np.arange(24)[:, None]).sum(axis=0)
         
-        # 识别仿真积压时段
-        sim_daily_hourly = df.groupby(['日期', '小时']).agg({
-            '仿真延误标记': ['count', 'sum']
-        })
-        sim_daily_hourly.columns = ['航班数', '延误航班数']
-        sim_daily_hourly = sim_daily_hourly.reset_index()
-        
-        sim_backlog_periods = sim_daily_hourly[
-            (sim_daily_hourly['航班数'] >= self.backlog_threshold) & 
-            (sim_daily_hourly['延误航班数'] > 0)
-        ]
-        
-        sim_backlog_hours = sim_backlog_periods.groupby('小时').size()
-        sim_frequent_hours = sim_backlog_hours[sim_backlog_hours >= 3].index.tolist()
-        
-        return {
-            'taxi_out': taxi_out_time,
-            'rot_scaling': rot_scaling,
-            'delay_rate': sim_delay_rate,
-            'avg_delay': avg_sim_delay,
-            'backlog_periods': len(sim_backlog_periods),
-            'frequent_hours': len(sim_frequent_hours),
-            'frequent_hour_list': sim_frequent_hours
-        }
+        results = []
+        cells = [(t, r) for t in taxi_out_options for r in rot_scaling_options]
+        for k, (taxi_out_time, rot_scaling) in enumerate(cells):
+            sim_frequent_hours = np.flatnonzero(sim_backlog_hours[:, k] >= 3).tolist()
+            results.append({
+                'taxi_out': taxi_out_time,
+                'rot_scaling': rot_scaling,
+                'delay_rate': sim_delay_rates[k],
+                'avg_delay': avg_sim_delays[k],
+                'backlog_periods': int(sim_backlog[:, k].sum()),
+                'frequent_hours': len(sim_frequent_hours),
+                'frequent_hour_list': sim_frequent_hours,
+                'frequent_hour_mask': int(frequent_masks[k])
+            })
+        
+        return results
         
     def comprehensive_parameter_test(self):
         """全面参数测试"""
@@ -192,31 +255,37 @@ class FinalParameterOptimizer:
         results = []
         real_delay_rate = self.real_data['延误标记'].mean() * 100
         
-        for taxi_out in self.taxi_out_options:
-            for rot_scaling in self.rot_scaling_options:
-                print(f"测试参数: taxi-out={taxi_out}min, ROT缩放={rot_scaling}")
-                
-                result = self.simulate_with_params(taxi_out, rot_scaling)
-                
-                # 计算评分
-                delay_rate_error = abs(result['delay_rate'] - real_delay_rate) / real_delay_rate * 100
-                hour_overlap = len(set(result['frequent_hour_list']) & set(self.frequent_backlog_hours))
-                overlap_rate = hour_overlap / len(self.frequent_backlog_hours) * 100 if self.frequent_backlog_hours else 0
-                
-                # 综合评分 (延误率偏差权重0.6，积压重叠率权重0.4)
-                score = (100 - delay_rate_error) * 0.6 + overlap_rate * 0.4
-                
-                result.update({
-                    'delay_rate_error': delay_rate_error,
-                    'overlap_rate': overlap_rate,
-                    'score': score
-                })
-                
-                results.append(result)
-                print(f"  延误率: {result['delay_rate']:.1f}% (误差{delay_rate_error:.1f}%)")
-                print(f"  积压重叠率: {overlap_rate:.1f}%")
-                print(f"  综合评分: {score:.1f}")
-                print()
+        # 真实频繁积压小时的位掩码只构建一次
+        ref_mask = 0
+        for hour in self.frequent_backlog_hours:
+            ref_mask |= 1 << int(hour)
+        
+        # 全部参数组合一次广播仿真
+        grid_results = self.simulate_param_grid(self.taxi_out_options, self.rot_scaling_options)
+        
+        for result in grid_results:
+            taxi_out, rot_scaling = result['taxi_out'], result['rot_scaling']
+            print(f"测试参数: taxi-out={taxi_out}min, ROT缩放={rot_scaling}")
+            
+            # 计算评分
+            delay_rate_error = abs(result['delay_rate'] - real_delay_rate) / real_delay_rate * 100
+            hour_overlap = bin(result['frequent_hour_mask'] & ref_mask).count('1')
+            overlap_rate = hour_overlap / len(self.frequent_backlog_hours) * 100 if self.frequent_backlog_hours else 0
+            
+            # 综合评分 (延误率偏差权重0.6，积压重叠率权重0.4)
+            score = (100 - delay_rate_error) * 0.6 + overlap_rate * 0.4
+            
+            result.update({
+                'delay_rate_error': delay_rate_error,
+                'overlap_rate': overlap_rate,
+                'score': score
+            })
+            
+            results.append(result)
+            print(f"  延误率: {result['delay_rate']:.1f}% (误差{delay_rate_error:.1f}%)")
+            print(f"  积压重叠率: {overlap_rate:.1f}%")
+            print(f"  综合评分: {score:.1f}")
+            print()
         
         self.optimization_results = pd.DataFrame(results)
         return self.optimization_results
@@ -318,6 +387,7 @@ class FinalParameterOptimizer:
         
         plt.tight_layout()
         plt.savefig('ZGGG参数优化热力图.png', dpi=300, bbox_inches='tight')
+        plt.close(fig)
         print("✅ 保存: ZGGG参数优化热力图.png")
         
     def create_comparison_chart(self):
@@ -353,22 +423,12 @@ class FinalParameterOptimizer:
         ax.legend()
         
         # 添加数值标签
-        def add_value_labels(bars):
-            for bar in bars:
-                height = bar.get_height()
-                ax.annotate(f'{height:.1f}',
-                           xy=(bar.get_x() + bar.get_width() / 2, height),
-                           xytext=(0, 3),
-                           textcoords="offset points",
-                           ha='center', va='bottom',
-                           fontweight='bold')
-        
-        add_value_labels(bars1)
-        add_value_labels(bars2)
-        add_value_labels(bars3)
+        for bars in (bars1, bars2, bars3):
+            ax.bar_label(bars, fmt='%.1f', padding=3, fontweight='bold')
         
         plt.tight_layout()
         plt.savefig('ZGGG参数优化效果对比.png', dpi=300, bbox_inches='tight')
+        plt.close(fig)
         print("✅ 保存: ZGGG参数优化效果对比.png")
         
     def generate_final_report(self):
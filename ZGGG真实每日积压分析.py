@@ -8,25 +8,48 @@ ZGGG起飞延误积压分析 - 真实每日积压时段识别
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
+from pathlib import Path
 import warnings
 warnings.filterwarnings('ignore')
 
+from _fast import hour_runs, sorted_group_sums
+
+# 原始数据路径及其ZGGG起飞子集的Parquet缓存(与xlsx同目录)
+DATA_PATH = Path('/Users/megrez/Library/Mobile Documents/com~apple~CloudDocs/BUAA/科研/挑战杯/航空挑战杯/数据/5月航班运行数据（脱敏）.xlsx')
+CACHE_PATH = DATA_PATH.with_name(DATA_PATH.stem + '_每日积压.parquet')
+
+# 安装python-calamine时用其解析xlsx(远快于openpyxl)，否则退回openpyxl
+try:
+    import python_calamine  # noqa: F401
+    EXCEL_ENGINE = 'calamine'
+except ImportError:
+    EXCEL_ENGINE = 'openpyxl'
+
 def load_and_clean_data():
     """载入数据并进行清洗"""
     print("=== 数据载入与清洗 ===")
     
-    df = pd.read_excel('/Users/megrez/Library/Mobile Documents/com~apple~CloudDocs/BUAA/科研/挑战杯/航空挑战杯/数据/5月航班运行数据（脱敏）.xlsx')
-    print(f"原始数据总记录数: {len(df)}")
+    time_fields = ['计划离港时间', '实际离港时间', '实际起飞时间', '原计划离港时间']
     
-    # 提取ZGGG起飞航班
-    zggg_dep = df[df['实际起飞站四字码'] == 'ZGGG'].copy()
+    # 缓存存在且不旧于xlsx时直接读取已解析好的ZGGG起飞航班
+    if CACHE_PATH.exists() and CACHE_PATH.stat().st_mtime >= DATA_PATH.stat().st_mtime:
+        zggg_dep = pd.read_parquet(CACHE_PATH, engine='pyarrow')
+        print(f"使用缓存: {CACHE_PATH.name}")
+    else:
+        # 只解析用到的列
+        df = pd.read_excel(DATA_PATH, usecols=['实际起飞站四字码'] + time_fields, engine=EXCEL_ENGINE)
+        print(f"原始数据总记录数: {len(df)}")
+        
+        # 提取ZGGG起飞航班
+        zggg_dep = df.loc[df['实际起飞站四字码'] == 'ZGGG', time_fields].copy()
+        
+        # 转换时间字段(写入缓存前完成，下次运行无需再解析)
+        for field in time_fields:
+            zggg_dep[field] = pd.to_datetime(zggg_dep[field], errors='coerce')
+        
+        zggg_dep.to_parquet(CACHE_PATH, engine='pyarrow', compression='zstd')
     print(f"ZGGG起飞航班总数: {len(zggg_dep)}")
     
-    # 转换时间字段
-    time_fields = ['计划离港时间', '实际离港时间', '实际起飞时间', '原计划离港时间']
-    for field in time_fields:
-        zggg_dep[field] = pd.to_datetime(zggg_dep[field], errors='coerce')
-    
     # 只保留有完整时间数据的航班
     valid_data = zggg_dep.dropna(subset=['计划离港时间', '实际离港时间', '实际起飞时间']).copy()
     print(f"有完整时间数据的航班: {len(valid_data)}")
@@ -36,41 +59,31 @@ def load_and_clean_data():
 def identify_weather_events_simple(data):
     """简单识别天气停飞事件"""
     # 计算基础延误时间
-    data['原始起飞延误分钟'] = (data['实际起飞时间'] - data['计划离港时间']).dt.total_seconds() / 60
+    data['原始起飞延误分钟'] = ((data['实际起飞时间'] - data['计划离港时间']).dt.total_seconds() / 60).astype('float32')
     
     # 识别可能的天气停飞事件：延误超过4小时(240分钟)
-    potential_weather_delays = data[data['原始起飞延误分钟'] > 240].copy()
+    long_delay_days = data.loc[data['原始起飞延误分钟'] > 240, '计划离港时间'].values.astype('datetime64[D]')
     
-    weather_affected_dates = set()
-    
-    if len(potential_weather_delays) > 0:
-        potential_weather_delays['date'] = potential_weather_delays['计划离港时间'].dt.date
-        
-        # 按日期分组，如果某天有3班以上长延误，认为是天气日
-        for date in potential_weather_delays['date'].unique():
-            day_weather = potential_weather_delays[potential_weather_delays['date'] == date]
-            if len(day_weather) >= 3:
-                weather_affected_dates.add(date)
+    # 按日期计数，如果某天有3班以上长延误，认为是天气日
+    days, counts = np.unique(long_delay_days, return_counts=True)
+    weather_affected_dates = set(days[counts >= 3].tolist())
     
     return weather_affected_dates
 
 def calculate_adjusted_delays(data, weather_dates):
     """计算调整后的延误（简化版天气处理）"""
-    data['调整后延误分钟'] = (data['实际起飞时间'] - data['计划离港时间']).dt.total_seconds() / 60
+    data['调整后延误分钟'] = ((data['实际起飞时间'] - data['计划离港时间']).dt.total_seconds() / 60).astype('float32')
     
-    # 对天气影响日期的航班进行简单调整
-    for date in weather_dates:
-        day_mask = data['计划离港时间'].dt.date == date
-        day_flights = data[day_mask]
+    # 对天气影响日期延误超过4小时的航班，将延误时间减少到合理范围(所有天气日一次筛选)
+    if weather_dates:
+        plan_days = data['计划离港时间'].values.astype('datetime64[D]')
+        weather_days = np.array(sorted(weather_dates), dtype='datetime64[D]')
+        adjustment_mask = np.isin(plan_days, weather_days) & (data['调整后延误分钟'].to_numpy() > 240)
         
-        # 对该天延误超过4小时的航班，将延误时间减少到合理范围
-        extreme_delays = (day_flights['调整后延误分钟'] > 240)
-        if extreme_delays.any():
+        if adjustment_mask.any():
             # 将极端延误调整为60-120分钟的随机值（模拟天气后的合理延误）
-            adjustment_mask = day_mask & (data['调整后延误分钟'] > 240)
-            np.random.seed(42)  # 保证结果可重现
-            adjusted_delays = np.random.uniform(60, 120, adjustment_mask.sum())
-            data.loc[adjustment_mask, '调整后延误分钟'] = adjusted_delays
+            rng = np.random.default_rng(42)  # 保证结果可重现
+            data.loc[adjustment_mask, '调整后延误分钟'] = rng.uniform(60, 120, adjustment_mask.sum()).astype('float32')
     
     return data
 
@@ -92,8 +105,8 @@ def identify_daily_backlog_periods(clean_data, delay_threshold=30, backlog_thres
     print(f"积压标准: 每小时超过{backlog_threshold}班延误航班")
     
     # 添加日期和小时字段
-    clean_data['date'] = clean_data['计划离港时间'].dt.date
-    clean_data['hour'] = clean_data['计划离港时间'].dt.hour
+    clean_data['date'] = clean_data['计划离港时间'].values.astype('datetime64[D]')
+    clean_data['hour'] = clean_data['计划离港时间'].dt.hour.astype('int8')
     
     # 识别延误航班
     delayed_flights = clean_data[clean_data['调整后延误分钟'] > delay_threshold].copy()
@@ -101,53 +114,46 @@ def identify_daily_backlog_periods(clean_data, delay_threshold=30, backlog_thres
     print(f"总延误航班: {len(delayed_flights)} 班")
     print(f"总分析天数: {clean_data['date'].nunique()} 天")
     
-    # 按日期和小时统计延误航班数
-    daily_hourly_delays = delayed_flights.groupby(['date', 'hour']).size().reset_index(name='delay_count')
+    # 按日期和小时统计延误航班数: datetime64[h]的整数值即 日序号*24+小时，排序后分段计数
+    hour_keys, delay_counts, _ = sorted_group_sums(
+        delayed_flights['计划离港时间'].values.astype('datetime64[h]').view('i8')
+    )
+    daily_hourly_delays = pd.DataFrame({
+        'date': (hour_keys // 24).astype('datetime64[D]').astype(object),
+        'hour': hour_keys % 24,
+        'delay_count': delay_counts
+    })
     
     # 识别积压时段（每小时延误航班超过阈值）
-    backlog_periods = daily_hourly_delays[daily_hourly_delays['delay_count'] > backlog_threshold].copy()
+    backlog_mask = delay_counts > backlog_threshold
+    backlog_keys = hour_keys[backlog_mask]
+    backlog_counts = delay_counts[backlog_mask]
+    backlog_periods = daily_hourly_delays[backlog_mask]
     
     print(f"\n发现积压时段: {len(backlog_periods)} 个")
     
-    # 按日期整理积压时段
+    # 按日期整理积压时段(键已按日期、小时升序)
     backlog_by_date = {}
     
-    for _, row in backlog_periods.iterrows():
-        date = row['date']
-        hour = row['hour']
-        count = row['delay_count']
-        
-        if date not in backlog_by_date:
-            backlog_by_date[date] = []
-        
-        backlog_by_date[date].append({
-            'hour': hour,
-            'delay_count': count
+    for date, hour, count in zip(backlog_periods['date'], backlog_periods['hour'], backlog_periods['delay_count']):
+        backlog_by_date.setdefault(date, []).append({
+            'hour': int(hour),
+            'delay_count': int(count)
         })
     
     # 输出详细结果
     print(f"\n=== 详细积压时段列表 ===")
     
-    total_backlog_periods = 0
-    backlog_hour_stats = {}  # 统计各小时的积压频次
-    
-    for date in sorted(backlog_by_date.keys()):
-        periods = backlog_by_date[date]
-        periods.sort(key=lambda x: x['hour'])
-        
+    for date, periods in backlog_by_date.items():
         print(f"\n{date} ({len(periods)}个积压时段):")
         
         for period in periods:
-            hour = period['hour']
-            count = period['delay_count']
-            total_backlog_periods += 1
-            
-            # 统计各小时积压频次
-            if hour not in backlog_hour_stats:
-                backlog_hour_stats[hour] = 0
-            backlog_hour_stats[hour] += 1
-            
-            print(f"  {hour:02d}:00-{hour+1:02d}:00  延误航班: {count} 班")
+            print(f"  {period['hour']:02d}:00-{period['hour']+1:02d}:00  延误航班: {period['delay_count']} 班")
+    
+    # 统计各小时积压频次
+    total_backlog_periods = len(backlog_keys)
+    hour_freq = np.bincount(backlog_keys % 24, minlength=24)
+    backlog_hour_stats = {int(hour): int(hour_freq[hour]) for hour in np.flatnonzero(hour_freq)}
     
     # 统计分析
     print(f"\n=== 积压统计分析 ===")
@@ -167,39 +173,22 @@ def identify_daily_backlog_periods(clean_data, delay_threshold=30, backlog_thres
     high_freq_hours = [hour for hour, freq in sorted_hours if freq >= 3]  # 出现3次以上
     print(f"\n高频积压时段(≥3次): {high_freq_hours}")
     
-    # 连续积压时段分析
+    # 连续积压时段分析: 同一天内相邻小时归为一段
     print(f"\n=== 连续积压时段分析 ===")
     
     consecutive_backlog_days = 0
-    
-    for date in sorted(backlog_by_date.keys()):
-        periods = backlog_by_date[date]
-        hours = [p['hour'] for p in periods]
-        hours.sort()
-        
-        # 识别连续小时
-        consecutive_groups = []
-        if hours:
-            current_group = [hours[0]]
-            for i in range(1, len(hours)):
-                if hours[i] - hours[i-1] == 1:
-                    current_group.append(hours[i])
-                else:
-                    consecutive_groups.append(current_group)
-                    current_group = [hours[i]]
-            consecutive_groups.append(current_group)
+    run_starts, run_lengths, run_totals = hour_runs(backlog_keys, backlog_counts)
+    
+    # 输出连续积压时段
+    for start_key, duration, total_delays in zip(run_starts, run_lengths, run_totals):
+        if duration >= 2:  # 连续2小时以上
+            consecutive_backlog_days += 1
+            date = np.datetime64(start_key // 24, 'D').astype(object)
+            start_hour = start_key % 24
+            end_hour = start_hour + duration - 1
             
-            # 输出连续积压时段
-            for i, group in enumerate(consecutive_groups):
-                if len(group) >= 2:  # 连续2小时以上
-                    consecutive_backlog_days += 1
-                    start_hour = group[0]
-                    end_hour = group[-1]
-                    duration = len(group)
-                    total_delays = sum([p['delay_count'] for p in periods if p['hour'] in group])
-                    
-                    print(f"  {date} 连续积压: {start_hour:02d}:00-{end_hour+1:02d}:00 "
-                          f"(持续{duration}小时, 共{total_delays}班延误)")
+            print(f"  {date} 连续积压: {start_hour:02d}:00-{end_hour+1:02d}:00 "
+                  f"(持续{duration}小时, 共{total_delays}班延误)")
     
     return backlog_by_date, backlog_hour_stats
 
@@ -207,41 +196,32 @@ def analyze_backlog_patterns(backlog_by_date):
     """分析积压模式"""
     print(f"\n=== 积压模式深度分析 ===")
     
-    # 工作日 vs 周末分析
-    weekday_backlog = 0
-    weekend_backlog = 0
-    
-    for date, periods in backlog_by_date.items():
-        # 获取星期几 (0=Monday, 6=Sunday)
-        weekday = pd.Timestamp(date).weekday()
-        
-        if weekday < 5:  # Monday-Friday
-            weekday_backlog += len(periods)
-        else:  # Saturday-Sunday
-            weekend_backlog += len(periods)
+    # 积压时段展开为整数键 日序号*24+小时，后续分类都在数组上完成
+    days = np.array(list(backlog_by_date), dtype='datetime64[D]').view('i8')
+    periods_per_day = [len(periods) for periods in backlog_by_date.values()]
+    hours = np.fromiter(
+        (period['hour'] for periods in backlog_by_date.values() for period in periods),
+        dtype=np.int64, count=sum(periods_per_day)
+    )
+    backlog_keys = np.repeat(days, periods_per_day) * 24 + hours
+    backlog_hours = hours.astype(np.int8)
+    
+    # 工作日 vs 周末分析: 1970-01-01为周四，(日序号+3)%7 即星期几 (0=Monday, 6=Sunday)
+    is_weekday = (backlog_keys // 24 + 3) % 7 < 5
+    weekday_backlog = int(is_weekday.sum())
+    weekend_backlog = len(backlog_keys) - weekday_backlog
     
     total_periods = weekday_backlog + weekend_backlog
     
     print(f"工作日积压时段: {weekday_backlog} 个 ({weekday_backlog/total_periods*100:.1f}%)")
     print(f"周末积压时段: {weekend_backlog} 个 ({weekend_backlog/total_periods*100:.1f}%)")
     
-    # 时段分布分析
-    morning_count = 0      # 06:00-11:59
-    afternoon_count = 0    # 12:00-17:59
-    evening_count = 0      # 18:00-23:59
-    midnight_count = 0     # 00:00-05:59
-    
-    for date, periods in backlog_by_date.items():
-        for period in periods:
-            hour = period['hour']
-            if 0 <= hour <= 5:
-                midnight_count += 1
-            elif 6 <= hour <= 11:
-                morning_count += 1
-            elif 12 <= hour <= 17:
-                afternoon_count += 1
-            elif 18 <= hour <= 23:
-                evening_count += 1
+    # 时段分布分析: 各小时计数后按6小时切片求和
+    hist = np.bincount(backlog_hours, minlength=24)
+    midnight_count = hist[0:6].sum()     # 00:00-05:59
+    morning_count = hist[6:12].sum()     # 06:00-11:59
+    afternoon_count = hist[12:18].sum()  # 12:00-17:59
+    evening_count = hist[18:24].sum()    # 18:00-23:59
     
     print(f"\n时段分布:")
     print(f"  凌晨(00:00-05:59): {midnight_count:2d} 个")
@@ -5,16 +5,47 @@ ZGGG机场积压时段优化分析
 测试动态阈值和其他优化方案
 """
 
+import copy
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
+from pathlib import Path
 import warnings
 warnings.filterwarnings('ignore')
 
+# 安装numexpr时把范围过滤的两个比较融合为一次遍历
+try:
+    import numexpr as ne
+except ImportError:
+    ne = None
+
+from _fast import threshold_counts
+
 # 设置中文字体
 plt.rcParams['font.sans-serif'] = ['SimHei', 'Arial Unicode MS']
 plt.rcParams['axes.unicode_minus'] = False
 
+# 原始数据路径及其ZGGG起飞子集(含派生列)的Parquet缓存(与xlsx同目录)
+DATA_PATH = Path('/Users/megrez/Library/Mobile Documents/com~apple~CloudDocs/BUAA/科研/挑战杯/航空挑战杯/数据/5月航班运行数据（脱敏）.xlsx')
+CACHE_PATH = DATA_PATH.with_name(DATA_PATH.stem + '_积压优化.parquet')
+CACHE_COLUMNS = ['计划离港时间', '实际离港时间', '起飞延误分钟', '小时', '日期']
+
+# 安装python-calamine时用其解析xlsx(远快于openpyxl)，否则退回openpyxl
+try:
+    import python_calamine  # noqa: F401
+    EXCEL_ENGINE = 'calamine'
+except ImportError:
+    EXCEL_ENGINE = 'openpyxl'
+
+# 方案A动态延误阈值(分钟)，按小时下标取值
+DYNAMIC_THRESHOLDS = np.array(
+    [30] * 6 +   # 00-05 夜间
+    [20] * 6 +   # 06-11 上午
+    [20] * 10 +  # 12-21 日间
+    [25] * 2,    # 22-23 深夜
+    dtype=np.int8
+)
+
 class OptimizedBacklogAnalyzer:
     def __init__(self):
         """初始化优化分析器"""
@@ -23,63 +54,122 @@ class OptimizedBacklogAnalyzer:
         
     def load_data(self):
         """载入数据"""
-        df = pd.read_excel('/Users/megrez/Library/Mobile Documents/com~apple~CloudDocs/BUAA/科研/挑战杯/航空挑战杯/数据/5月航班运行数据（脱敏）.xlsx')
-        zggg_flights = df[df['计划起飞站四字码'] == 'ZGGG'].copy()
+        # 缓存存在且不旧于xlsx时直接读取已清洗好的ZGGG航班，跳过xlsx解析和预处理
+        if CACHE_PATH.exists() and CACHE_PATH.stat().st_mtime >= DATA_PATH.stat().st_mtime:
+            self.data = pd.read_parquet(CACHE_PATH, engine='pyarrow')
+            print(f"使用缓存: {CACHE_PATH.name}")
+        else:
+            # 只解析用到的列
+            time_cols = ['计划离港时间', '实际离港时间']
+            df = pd.read_excel(DATA_PATH, usecols=['计划起飞站四字码'] + time_cols, engine=EXCEL_ENGINE)
+            zggg_flights = df[df['计划起飞站四字码'] == 'ZGGG'].copy()
+            
+            # 时间格式转换和延误计算
+            for col in time_cols:
+                zggg_flights[col] = pd.to_datetime(zggg_flights[col], errors='coerce')
+            
+            # 纳秒时间戳直接做int64相减，缺失时间的航班记为NaN(随后被范围过滤剔除)
+            plan_time = zggg_flights['计划离港时间'].to_numpy(dtype='datetime64[ns]')
+            actual_time = zggg_flights['实际离港时间'].to_numpy(dtype='datetime64[ns]')
+            delay = ((actual_time.view('i8') - plan_time.view('i8')) / 60_000_000_000).astype(np.float32)
+            delay[np.isnat(plan_time) | np.isnat(actual_time)] = np.nan
+            zggg_flights['起飞延误分钟'] = delay
+            
+            # 过滤异常数据
+            if ne is not None:
+                valid_mask = ne.evaluate('(delay >= -60) & (delay <= 600)')
+            else:
+                valid_mask = (delay >= -60) & (delay <= 600)
+            self.data = zggg_flights[valid_mask].copy()
+            
+            self.data['小时'] = self.data['计划离港时间'].dt.hour.astype('int8')
+            # 日期保持datetime64而非datetime.date对象，分组时可直接转为整数日序号
+            self.data['日期'] = self.data['计划离港时间'].dt.floor('D')
+            
+            # 只缓存后续分析用到的列(其余列可能是无法写入Parquet的混合类型)
+            self.data = self.data[CACHE_COLUMNS]
+            self.data.to_parquet(CACHE_PATH, engine='pyarrow', compression='zstd')
         
-        # 时间格式转换和延误计算
-        time_cols = ['计划离港时间', '实际离港时间']
-        for col in time_cols:
-            zggg_flights[col] = pd.to_datetime(zggg_flights[col], errors='coerce')
+        # 各方案只读的列提取为NumPy数组一次，不再复制DataFrame
+        self._delay = self.data['起飞延误分钟'].to_numpy(dtype=np.float32)
+        self._hour = self.data['小时'].to_numpy(dtype=np.int8)
         
-        zggg_flights['起飞延误分钟'] = (
-            zggg_flights['实际离港时间'] - zggg_flights['计划离港时间']
-        ).dt.total_seconds() / 60
+        # (日期, 小时)编码为整数键 日序号*24+小时，分组统计直接用bincount
+        day_code = self.data['日期'].values.astype('datetime64[D]').view('i8')
+        day_idx = day_code - day_code.min()
+        self._n_days = int(day_idx.max()) + 1
+        self._hour_key = day_idx * 24 + self._hour
+        self._hour_flights = np.bincount(self._hour_key, minlength=self._n_days * 24)
         
-        # 过滤异常数据
-        self.data = zggg_flights[
-            (zggg_flights['起飞延误分钟'] >= -60) &
-            (zggg_flights['起飞延误分钟'] <= 600)
-        ].copy()
+        # 各小时航班数由各时段航班数按天求和得到，各方案共用
+        self._hour_counts = self._hour_flights.reshape(self._n_days, 24).sum(axis=0)
         
-        self.data['小时'] = self.data['计划离港时间'].dt.hour
-        self.data['日期'] = self.data['计划离港时间'].dt.date
+        self._relative_thresholds = self._hourly_relative_thresholds()
+        self._scheme_cache = None
+        self._result_cache = {}
         
         print(f"载入ZGGG航班数据: {len(self.data)} 班")
         return self.data
     
-    def test_dynamic_threshold(self):
-        """测试动态阈值方案"""
-        print(f"\n=== 方案A: 动态阈值测试 ===")
+    def _hourly_relative_thresholds(self):
+        """计算每小时的相对阈值（平均值 + 0.5个标准差），长度24，无航班的小时为10"""
+        delay = self._delay.astype(np.float64)
+        count = self._hour_counts
+        total = np.bincount(self._hour, weights=delay, minlength=24)
+        total_sq = np.bincount(self._hour, weights=delay * delay, minlength=24)
         
-        # 动态阈值设定
-        dynamic_thresholds = {
-            0: 30, 1: 30, 2: 30, 3: 30, 4: 30, 5: 30,  # 夜间
-            6: 20, 7: 20, 8: 20, 9: 20, 10: 20, 11: 20,  # 上午
-            12: 20, 13: 20, 14: 20, 15: 20, 16: 20, 17: 20, 18: 20, 19: 20, 20: 20, 21: 20,  # 日间
-            22: 25, 23: 25  # 深夜
-        }
+        # 样本标准差(ddof=1)，与pandas的std一致；不足2班的小时记为0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = np.where(count > 0, total / count, 0)
+            var = np.where(count > 1, (total_sq - count * mean * mean) / (count - 1), 0)
+        std = np.sqrt(np.maximum(var, 0))
         
-        data = self.data.copy()
+        # 确保最小阈值为10分钟
+        return np.maximum(mean + 0.5 * std, 10)
+    
+    def _scheme_counts(self):
+        """一次计算各方案按(日期, 小时)的延误航班数
         
-        # 应用动态阈值
-        data['动态延误阈值'] = data['小时'].map(dynamic_thresholds)
-        data['动态延误标记'] = data['起飞延误分钟'] > data['动态延误阈值']
+        返回{方案: 各时段延误航班数}，方案为fixed15/dynamic/relative
+        """
+        if self._scheme_cache is None:
+            scheme_thresholds = {
+                'fixed15': np.full(24, 15),                 # 原始方案: 15分钟固定阈值
+                'dynamic': DYNAMIC_THRESHOLDS,              # 方案A: 动态阈值
+                'relative': self._relative_thresholds       # 方案B: 相对阈值
+            }
+            # 延误判定与分时段计数在同一内核中完成(安装numba时并行)
+            self._scheme_cache = {
+                scheme: threshold_counts(self._delay, self._hour, self._hour_key,
+                                         thresholds, self._hour_flights.size)
+                for scheme, thresholds in scheme_thresholds.items()
+            }
+        return self._scheme_cache
+    
+    def _remember(self, key, result):
+        """缓存方案结果(数据重新载入前不变)，返回副本以免调用方修改缓存"""
+        self._result_cache[key] = result
+        return copy.deepcopy(result)
+    
+    def test_dynamic_threshold(self):
+        """测试动态阈值方案"""
+        key = ('dynamic', self.backlog_threshold)
+        if key in self._result_cache:
+            return copy.deepcopy(self._result_cache[key])
+        
+        print(f"\n=== 方案A: 动态阈值测试 ===")
         
-        # 统计积压时段
-        hourly_stats = data.groupby(['日期', '小时']).agg({
-            '动态延误标记': ['count', 'sum'],
-            '动态延误阈值': 'first'
-        })
-        hourly_stats.columns = ['航班数', '延误航班数', '阈值']
-        hourly_stats = hourly_stats.reset_index()
+        # 应用动态阈值并统计积压时段
+        dynamic_delayed = self._scheme_counts()['dynamic']
         
-        backlog_periods = hourly_stats[hourly_stats['延误航班数'] >= self.backlog_threshold]
+        # 积压时段的格键(日序号*24+小时)
+        backlog_periods = np.flatnonzero(dynamic_delayed >= self.backlog_threshold)
         
         if len(backlog_periods) > 0:
-            backlog_hours = sorted(backlog_periods['小时'].unique())
+            backlog_hours = np.unique(backlog_periods % 24).tolist()
             backlog_count = len(backlog_periods)
-            delayed_flights = data['动态延误标记'].sum()
-            delayed_ratio = delayed_flights / len(data) * 100
+            delayed_flights = dynamic_delayed.sum()
+            delayed_ratio = delayed_flights / len(self._delay) * 100
             
             print(f"动态阈值方案结果:")
             print(f"  延误航班: {delayed_flights} 班 ({delayed_ratio:.1f}%)")
@@ -87,53 +177,41 @@ class OptimizedBacklogAnalyzer:
             print(f"  积压小时: {backlog_hours}")
             print(f"  涉及小时数: {len(backlog_hours)} 个")
             
-            return {
+            return self._remember(key, {
                 'method': 'dynamic',
                 'backlog_hours': backlog_hours,
                 'backlog_count': backlog_count,
                 'delayed_ratio': delayed_ratio
-            }
+            })
         else:
             print("动态阈值方案：无积压时段")
-            return {'method': 'dynamic', 'backlog_hours': [], 'backlog_count': 0}
+            return self._remember(key, {'method': 'dynamic', 'backlog_hours': [], 'backlog_count': 0})
     
     def test_relative_threshold(self):
         """测试相对阈值方案"""
-        print(f"\n=== 方案B: 相对阈值测试 ===")
-        
-        data = self.data.copy()
-        
-        # 计算每小时的相对阈值（平均值 + 0.5个标准差）
-        hourly_stats = data.groupby('小时')['起飞延误分钟'].agg(['mean', 'std']).fillna(0)
-        hourly_stats['相对阈值'] = hourly_stats['mean'] + 0.5 * hourly_stats['std']
+        key = ('relative', self.backlog_threshold)
+        if key in self._result_cache:
+            return copy.deepcopy(self._result_cache[key])
         
-        # 确保最小阈值为10分钟
-        hourly_stats['相对阈值'] = hourly_stats['相对阈值'].clip(lower=10)
+        print(f"\n=== 方案B: 相对阈值测试 ===")
         
         print("各小时相对阈值:")
-        for hour in range(24):
-            if hour in hourly_stats.index:
-                threshold = hourly_stats.loc[hour, '相对阈值']
-                print(f"  {hour:02d}:00 - 阈值: {threshold:.1f}分钟")
-        
-        # 应用相对阈值
-        data['相对阈值'] = data['小时'].map(hourly_stats['相对阈值'])
-        data['相对延误标记'] = data['起飞延误分钟'] > data['相对阈值']
+        print('\n'.join(
+            f"  {hour:02d}:00 - 阈值: {self._relative_thresholds[hour]:.1f}分钟"
+            for hour in np.flatnonzero(self._hour_counts)
+        ))
         
-        # 统计积压时段
-        hourly_backlog = data.groupby(['日期', '小时']).agg({
-            '相对延误标记': ['count', 'sum']
-        })
-        hourly_backlog.columns = ['航班数', '延误航班数']
-        hourly_backlog = hourly_backlog.reset_index()
+        # 应用相对阈值并统计积压时段
+        relative_delayed = self._scheme_counts()['relative']
         
-        backlog_periods = hourly_backlog[hourly_backlog['延误航班数'] >= self.backlog_threshold]
+        # 积压时段的格键(日序号*24+小时)
+        backlog_periods = np.flatnonzero(relative_delayed >= self.backlog_threshold)
         
         if len(backlog_periods) > 0:
-            backlog_hours = sorted(backlog_periods['小时'].unique())
+            backlog_hours = np.unique(backlog_periods % 24).tolist()
             backlog_count = len(backlog_periods)
-            delayed_flights = data['相对延误标记'].sum()
-            delayed_ratio = delayed_flights / len(data) * 100
+            delayed_flights = relative_delayed.sum()
+            delayed_ratio = delayed_flights / len(self._delay) * 100
             
             print(f"\n相对阈值方案结果:")
             print(f"  延误航班: {delayed_flights} 班 ({delayed_ratio:.1f}%)")
@@ -141,38 +219,40 @@ class OptimizedBacklogAnalyzer:
             print(f"  积压小时: {backlog_hours}")
             print(f"  涉及小时数: {len(backlog_hours)} 个")
             
-            return {
+            return self._remember(key, {
                 'method': 'relative',
                 'backlog_hours': backlog_hours,
                 'backlog_count': backlog_count,
                 'delayed_ratio': delayed_ratio
-            }
+            })
         else:
             print("相对阈值方案：无积压时段")
-            return {'method': 'relative', 'backlog_hours': [], 'backlog_count': 0}
+            return self._remember(key, {'method': 'relative', 'backlog_hours': [], 'backlog_count': 0})
     
     def test_higher_backlog_threshold(self):
         """测试提高积压判定门槛"""
+        key = ('higher_threshold',)
+        if key in self._result_cache:
+            return copy.deepcopy(self._result_cache[key])
+        
         print(f"\n=== 方案C: 提高积压判定门槛测试 ===")
         
-        data = self.data.copy()
-        data['延误标记'] = data['起飞延误分钟'] > 15  # 使用15分钟阈值
+        delayed = self._scheme_counts()['fixed15']  # 使用15分钟阈值
         
-        thresholds = [15, 20, 25, 30]
+        thresholds = np.array([15, 20, 25, 30])
         results = []
+        lines = []
         
-        for threshold in thresholds:
-            hourly_stats = data.groupby(['日期', '小时']).agg({
-                '延误标记': ['count', 'sum']
-            })
-            hourly_stats.columns = ['航班数', '延误航班数']
-            hourly_stats = hourly_stats.reset_index()
-            
-            backlog_periods = hourly_stats[hourly_stats['延误航班数'] >= threshold]
+        # 各时段对各门槛是否积压 (时段, 门槛)，一次比较得到全部门槛的结果
+        backlog_hits = delayed[:, None] >= thresholds
+        backlog_counts = backlog_hits.sum(axis=0)
+        hour_hits = backlog_hits.reshape(self._n_days, 24, len(thresholds)).any(axis=0)
+        
+        for j, threshold in enumerate(thresholds.tolist()):
+            backlog_count = int(backlog_counts[j])
             
-            if len(backlog_periods) > 0:
-                backlog_hours = sorted(backlog_periods['小时'].unique())
-                backlog_count = len(backlog_periods)
+            if backlog_count > 0:
+                backlog_hours = np.flatnonzero(hour_hits[:, j]).tolist()
                 
                 results.append({
                     'threshold': threshold,
@@ -181,29 +261,25 @@ class OptimizedBacklogAnalyzer:
                     'hour_count': len(backlog_hours)
                 })
                 
-                print(f"积压门槛 {threshold:2d}班: 积压时段 {backlog_count:3d}个, "
-                      f"涉及小时 {len(backlog_hours):2d}个, 小时分布 {backlog_hours}")
+                lines.append(f"积压门槛 {threshold:2d}班: 积压时段 {backlog_count:3d}个, "
+                             f"涉及小时 {len(backlog_hours):2d}个, 小时分布 {backlog_hours}")
             else:
-                print(f"积压门槛 {threshold:2d}班: 无积压时段")
+                lines.append(f"积压门槛 {threshold:2d}班: 无积压时段")
+        
+        print('\n'.join(lines))
         
-        return results
+        return self._remember(key, results)
     
     def compare_all_methods(self):
         """综合比较所有方案"""
         print(f"\n=== 方案比较总结 ===")
         
         # 原始方案（15分钟固定阈值）
-        data = self.data.copy()
-        data['延误标记'] = data['起飞延误分钟'] > 15
-        hourly_stats = data.groupby(['日期', '小时']).agg({
-            '延误标记': ['count', 'sum']
-        })
-        hourly_stats.columns = ['航班数', '延误航班数']
-        hourly_stats = hourly_stats.reset_index()
-        original_backlog = hourly_stats[hourly_stats['延误航班数'] >= 10]
+        original_backlog = np.flatnonzero(self._scheme_counts()['fixed15'] >= 10)
+        original_hours = np.unique(original_backlog % 24)
         
         print(f"原始方案(15分钟固定):")
-        print(f"  积压小时: {len(original_backlog['小时'].unique())}个")
+        print(f"  积压小时: {len(original_hours)}个")
         print(f"  积压时段: {len(original_backlog)}个")
         
         # 测试各方案
@@ -225,7 +301,7 @@ class OptimizedBacklogAnalyzer:
         print(f"3. 提高门槛方案: 推荐使用20班作为积压门槛")
         
         return {
-            'original': len(original_backlog['小时'].unique()),
+            'original': len(original_hours),
             'dynamic': dynamic_result,
             'relative': relative_result,
             'higher_threshold': higher_threshold_results
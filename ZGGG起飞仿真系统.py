@@ -307,8 +307,14 @@ class ZGGGDepartureSimulator:
         
         return True
     
-    def simulate_runway_queue(self, target_date=None, verbose=False):
-        """仿真跑道排队"""
+    def simulate_runway_queue(self, target_date=None, verbose=False, day_flights=None):
+        """仿真跑道排队
+        
+        Args:
+            target_date: 仿真日期
+            verbose: 是否输出详细信息
+            day_flights: 预先切分好的当日航班，提供时跳过按日期筛选全量数据
+        """
         print(f"\n=== 跑道排队仿真 ===")
         
         if self.data is None:
@@ -327,9 +333,11 @@ class ZGGGDepartureSimulator:
         print(f"仿真日期: {target_date}")
         
         # 提取当日航班
-        day_flights = self.data[
-            self.data['计划离港时间'].dt.date == target_date
-        ].copy().sort_values('计划离港时间')
+        if day_flights is None:
+            day_flights = self.data[
+                self.data['计划离港时间'].dt.date == target_date
+            ]
+        day_flights = day_flights.sort_values('计划离港时间')
         
         print(f"当日航班数: {len(day_flights)} 班")
         
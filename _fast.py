@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+积压分析热点内核及数据载入共用函数
+安装numba时首次调用才即时编译(cache=True，编译结果缓存到磁盘)，
+未安装时退回等价的NumPy实现
+"""
+
+import numpy as np
+import pandas as pd
+
+NS_PER_HOUR = 3_600_000_000_000
+
+# 时间字符串的常见格式，按此格式解析最快
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# pandas 2.0起支持format='mixed'逐值推断格式，此前不指定format即为推断
+_INFER_FORMAT = {'format': 'mixed'} if int(pd.__version__.split('.')[0]) >= 2 else {}
+
+_jit_cache = {}
+
+# 并行内核中的循环写作prange，未安装numba时退化为普通range
+try:
+    from numba import prange
+except ImportError:
+    prange = range
+
+
+def _jit(func, parallel=False):
+    """惰性获取func的numba编译版本，numba不可用时返回None"""
+    if func not in _jit_cache:
+        try:
+            from numba import njit
+            _jit_cache[func] = njit(cache=True, parallel=parallel)(func)
+        except ImportError:
+            _jit_cache[func] = None
+    return _jit_cache[func]
+
+
+def parse_time_strings(values, field=None):
+    """解析时间列，无法解析的值置为NaT
+
+    先按TIME_FORMAT解析，有非空值因格式不符变为NaT时整列改为推断格式重新解析。
+    给出field(分析实际用到的列)时，对仍无法解析的非空值打印警告
+    """
+    present = values.notna()
+    parsed = pd.to_datetime(values, format=TIME_FORMAT, errors='coerce', cache=True)
+    if (parsed.isna() & present).any():
+        parsed = pd.to_datetime(values, errors='coerce', cache=True, **_INFER_FORMAT)
+    
+    if field is not None:
+        n_lost = int((parsed.isna() & present).sum())
+        if n_lost > 0:
+            print(f"警告: 时间列'{field}'有{n_lost}/{int(present.sum())}个值无法解析，已置为空")
+    return parsed
+
+
+def _bucket_hours_kernel(ns_arr, out):
+    for i in range(ns_arr.size):
+        out[(ns_arr[i] // NS_PER_HOUR) % 24] += 1
+    return out
+
+
+def _run_breaks_kernel(sorted_arr, breaks):
+    n_breaks = 0
+    for i in range(1, sorted_arr.size):
+        if sorted_arr[i] - sorted_arr[i - 1] != 1:
+            breaks[n_breaks] = i
+            n_breaks += 1
+    return n_breaks
+
+
+def bucket_hours(ns_arr):
+    """按小时(0-23)统计int64纳秒时间戳数组的个数"""
+    ns_arr = np.ascontiguousarray(ns_arr, dtype=np.int64)
+    kernel = _jit(_bucket_hours_kernel)
+    if kernel is None:
+        return np.bincount((ns_arr // NS_PER_HOUR) % 24, minlength=24)
+    return kernel(ns_arr, np.zeros(24, dtype=np.int64))
+
+
+def find_runs(values):
+    """将整数序列排序后切分为连续段，返回列表的列表"""
+    arr = np.sort(np.asarray(values, dtype=np.int64))
+    if arr.size == 0:
+        return []
+    kernel = _jit(_run_breaks_kernel)
+    if kernel is None:
+        breaks = np.flatnonzero(np.diff(arr) != 1) + 1
+    else:
+        breaks = np.empty(arr.size, dtype=np.int64)
+        breaks = breaks[:kernel(arr, breaks)]
+    return [run.tolist() for run in np.split(arr, breaks)]
+
+
+def _hour_date_reduce_kernel(hours, day_idx, delayed, tot, dly):
+    for i in range(hours.shape[0]):
+        h = hours[i]
+        d = day_idx[i]
+        tot[h, d] += 1
+        if delayed[i]:
+            dly[h, d] += 1
+    return tot, dly
+
+
+def hour_date_counts(hours, day_idx, delayed, n_days):
+    """按(小时, 日序号)统计总数和延误数，返回两个24×n_days的int32矩阵"""
+    hours = np.ascontiguousarray(hours, dtype=np.int64)
+    day_idx = np.ascontiguousarray(day_idx, dtype=np.int64)
+    delayed = np.ascontiguousarray(delayed, dtype=np.bool_)
+    kernel = _jit(_hour_date_reduce_kernel)
+    if kernel is None:
+        flat = hours * n_days + day_idx
+        tot = np.bincount(flat, minlength=24 * n_days).reshape(24, n_days)
+        dly = np.bincount(flat[delayed], minlength=24 * n_days).reshape(24, n_days)
+        return tot.astype(np.int32), dly.astype(np.int32)
+    tot = np.zeros((24, n_days), dtype=np.int32)
+    dly = np.zeros((24, n_days), dtype=np.int32)
+    return kernel(hours, day_idx, delayed, tot, dly)
+
+
+def _weather_adjust_kernel(plan_ns, takeoff_ns, raw_delay, in_period, start_ns, end_ns,
+                           window_ns, out, affected):
+    for i in range(plan_ns.size):
+        out[i] = raw_delay[i]
+        if not in_period[i]:
+            continue
+        p = plan_ns[i]
+        t = takeoff_ns[i]
+        e = end_ns[i]
+        in_suspend = p >= start_ns[i] and p <= e
+        if in_suspend or (t >= e and t <= e + window_ns):
+            if in_suspend or raw_delay[i] > 60:
+                out[i] = max((t - max(p, e)) / 60_000_000_000, 0.0)
+            else:
+                out[i] = max(raw_delay[i], 0.0)
+            affected[i] = True
+    return out, affected
+
+
+def weather_adjusted_delays(plan_ns, takeoff_ns, raw_delay, in_period, start_ns, end_ns, window_ns):
+    """按停飞时段修正延误分钟(各数组按航班对齐，start/end为该航班所属停飞事件)
+
+    计划在停飞时段内或延误超过1小时的恢复期航班从max(计划, 恢复)起算，
+    其余恢复期航班保留原延误，均不允许为负。返回(float32修正延误, 是否受天气影响)
+    """
+    plan_ns = np.ascontiguousarray(plan_ns, dtype=np.int64)
+    takeoff_ns = np.ascontiguousarray(takeoff_ns, dtype=np.int64)
+    raw_delay = np.ascontiguousarray(raw_delay, dtype=np.float32)
+    in_period = np.ascontiguousarray(in_period, dtype=np.bool_)
+    start_ns = np.ascontiguousarray(start_ns, dtype=np.int64)
+    end_ns = np.ascontiguousarray(end_ns, dtype=np.int64)
+    kernel = _jit(_weather_adjust_kernel)
+    if kernel is None:
+        in_suspend = in_period & (plan_ns >= start_ns) & (plan_ns <= end_ns)
+        in_resume = in_period & (takeoff_ns >= end_ns) & (takeoff_ns <= end_ns + window_ns)
+        affected = in_suspend | in_resume
+        from_resume = (takeoff_ns - np.maximum(plan_ns, end_ns)) / 60_000_000_000
+        adjusted = np.where(in_suspend | (raw_delay > 60), from_resume, raw_delay)
+        out = np.where(affected, np.maximum(adjusted, 0), raw_delay).astype(np.float32)
+        return out, affected
+    out = np.empty(plan_ns.size, dtype=np.float32)
+    affected = np.zeros(plan_ns.size, dtype=np.bool_)
+    return kernel(plan_ns, takeoff_ns, raw_delay, in_period, start_ns, end_ns,
+                  np.int64(window_ns), out, affected)
+
+
+def sorted_group_sums(keys, values=None):
+    """按整数键分组(排序+reduceat，不经过哈希)
+
+    返回(升序唯一键, 各组元素数, 各组values之和)；values可为二维，按行分组，
+    未给出values时第三项为None
+    """
+    keys = np.asarray(keys, dtype=np.int64)
+    order = np.argsort(keys, kind='stable')
+    k_sorted = keys[order]
+    if k_sorted.size == 0:
+        sums = None if values is None else np.asarray(values)[:0]
+        return k_sorted, np.zeros(0, dtype=np.int64), sums
+    edges = np.concatenate(([0], np.flatnonzero(np.diff(k_sorted)) + 1))
+    counts = np.diff(np.append(edges, k_sorted.size))
+    sums = None if values is None else np.add.reduceat(np.asarray(values)[order], edges, axis=0)
+    return k_sorted[edges], counts, sums
+
+
+def _hour_runs_kernel(keys, counts, starts, lengths, totals):
+    n_runs = 0
+    for i in range(keys.size):
+        if i == 0 or keys[i] - keys[i - 1] != 1 or keys[i] // 24 != keys[i - 1] // 24:
+            starts[n_runs] = keys[i]
+            lengths[n_runs] = 0
+            totals[n_runs] = 0
+            n_runs += 1
+        lengths[n_runs - 1] += 1
+        totals[n_runs - 1] += counts[i]
+    return n_runs
+
+
+def hour_runs(hour_keys, counts):
+    """把升序的小时键(日序号*24+小时)切分为同一天内的连续小时段
+
+    返回(各段起始键, 持续小时数, 段内counts之和)
+    """
+    hour_keys = np.ascontiguousarray(hour_keys, dtype=np.int64)
+    counts = np.ascontiguousarray(counts, dtype=np.int64)
+    kernel = _jit(_hour_runs_kernel)
+    if kernel is None:
+        if hour_keys.size == 0:
+            return hour_keys, np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        breaks = np.flatnonzero(
+            (np.diff(hour_keys) != 1) | (hour_keys[1:] // 24 != hour_keys[:-1] // 24)
+        ) + 1
+        first = np.concatenate(([0], breaks))
+        lengths = np.diff(np.append(first, hour_keys.size))
+        return hour_keys[first], lengths, np.add.reduceat(counts, first)
+    starts = np.empty(hour_keys.size, dtype=np.int64)
+    lengths = np.empty(hour_keys.size, dtype=np.int64)
+    totals = np.empty(hour_keys.size, dtype=np.int64)
+    n_runs = kernel(hour_keys, counts, starts, lengths, totals)
+    return starts[:n_runs], lengths[:n_runs], totals[:n_runs]
+
+
+def _param_grid_kernel(delay, peak, group_idx, taxi, rot, threshold,
+                       delayed_total, delay_sum, group_delayed):
+    # 各参数组合互相独立，按组合并行；每个线程只写自己那一列
+    for k in prange(taxi.size):
+        t = taxi[k]
+        r = rot[k]
+        n_delayed = 0
+        total = 0.0
+        for i in range(delay.size):
+            d = max(delay[i] - t + 10, 0.0)
+            if peak[i]:
+                d += d * (r - 1) * 0.5
+            total += d
+            if d > threshold:
+                n_delayed += 1
+                group_delayed[group_idx[i], k] += 1
+        delayed_total[k] = n_delayed
+        delay_sum[k] = total
+    return delayed_total, delay_sum, group_delayed
+
+
+def param_grid_counts(delay, peak, group_idx, n_groups, taxi, rot, threshold):
+    """按参数组合(taxi[k], rot[k])仿真延误并统计
+
+    仿真延误 = max(delay - taxi + 10, 0)，高峰航班再加 (rot-1)*0.5 倍。
+    返回(各组合延误航班数, 各组合延误分钟之和, n_groups×组合数的分组延误航班数)
+    """
+    delay = np.ascontiguousarray(delay, dtype=np.float32)
+    peak = np.ascontiguousarray(peak, dtype=np.bool_)
+    group_idx = np.ascontiguousarray(group_idx, dtype=np.int64)
+    taxi = np.ascontiguousarray(taxi, dtype=np.float64)
+    rot = np.ascontiguousarray(rot, dtype=np.float64)
+    kernel = _jit(_param_grid_kernel, parallel=True)
+    if kernel is None:
+        base = np.maximum(0, delay[:, None] - taxi + 10)
+        sim_delay = base + np.where(peak[:, None], base * (rot - 1) * 0.5, 0)
+        sim_flag = sim_delay > threshold
+        group_delayed = np.zeros((n_groups, taxi.size), dtype=np.int32)
+        keys, _, sums = sorted_group_sums(group_idx, sim_flag.astype(np.int32))
+        group_delayed[keys] = sums
+        return sim_flag.sum(axis=0), sim_delay.sum(axis=0), group_delayed
+    delayed_total = np.zeros(taxi.size, dtype=np.int64)
+    delay_sum = np.zeros(taxi.size, dtype=np.float64)
+    group_delayed = np.zeros((n_groups, taxi.size), dtype=np.int32)
+    return kernel(delay, peak, group_idx, taxi, rot, float(threshold),
+                  delayed_total, delay_sum, group_delayed)
+
+
+def _threshold_counts_kernel(delay, hour, hour_key, thresholds, partial):
+    # 航班按块并行，每块累加到自己那一行，最后在外部合并，避免多线程写同一计数
+    n_chunks = partial.shape[0]
+    chunk = (delay.size + n_chunks - 1) // n_chunks
+    for c in prange(n_chunks):
+        for i in range(c * chunk, min((c + 1) * chunk, delay.size)):
+            if delay[i] > thresholds[hour[i]]:
+                partial[c, hour_key[i]] += 1
+    return partial
+
+
+def threshold_counts(delay, hour, hour_key, thresholds, n_cells, n_chunks=16):
+    """按各小时阈值判定延误，并按时段键统计延误航班数
+
+    thresholds为长度24的各小时延误阈值，hour_key取值在[0, n_cells)。
+    返回长度n_cells的int64数组
+    """
+    delay = np.ascontiguousarray(delay)
+    hour = np.ascontiguousarray(hour, dtype=np.int64)
+    hour_key = np.ascontiguousarray(hour_key, dtype=np.int64)
+    thresholds = np.ascontiguousarray(thresholds, dtype=np.float64)
+    kernel = _jit(_threshold_counts_kernel, parallel=True)
+    if kernel is None:
+        return np.bincount(hour_key[delay > thresholds[hour]], minlength=n_cells)
+    partial = np.zeros((n_chunks, n_cells), dtype=np.int64)
+    return kernel(delay, hour, hour_key, thresholds, partial).sum(axis=0)